@@ -0,0 +1,205 @@
+"""
+Numba-compiled DBSCAN built on a pre-allocated KD-tree.
+
+The tree layout mirrors scikit-learn's binary tree (``idx_array``, ``node_data``
+and ``node_bounds`` arrays with nodes stored in heap order), so radius queries
+run as compiled loops over flat arrays instead of dispatching per neighbor.
+Neighborhoods are never stored: core points are found with a counting pass and
+the cluster expansion re-queries the tree, which keeps memory at O(N) even for
+large ``min_samples``.
+"""
+
+from collections import namedtuple
+from typing import Optional, Tuple
+
+from numba import njit, prange
+from numpy.typing import NDArray
+import numpy as np
+
+
+KDTree = namedtuple('KDTree', ['data', 'idx_array', 'node_data', 'node_bounds'])
+
+
+@njit(cache=True)
+def build_kdtree(X: NDArray, leaf_size: int = 40) -> KDTree:
+    """
+    Builds a KD-tree over the rows of X.
+
+    Args:
+        X (NDArray): (N, D) data to index.
+        leaf_size (int): Maximum number of points in a leaf node.
+
+    Returns:
+        KDTree: Tree arrays. ``node_data`` holds (idx_start, idx_end, is_leaf)
+            per node, ``node_bounds`` holds the per-node min (row 0) and max (row 1).
+    """
+    n_samples, n_features = X.shape
+    n_levels = 1 + int(np.log2(max(1, (n_samples - 1) // leaf_size)))
+    n_nodes = 2 ** n_levels - 1
+
+    idx_array = np.arange(n_samples).astype(np.int32)
+    node_data = np.zeros((n_nodes, 3), dtype=np.int32)
+    node_bounds = np.empty((2, n_nodes, n_features), dtype=X.dtype)
+    node_data[0, 1] = n_samples
+
+    # heap order guarantees a parent is partitioned before its children
+    for i_node in range(n_nodes):
+        idx_start = node_data[i_node, 0]
+        idx_end = node_data[i_node, 1]
+        for d in range(n_features):
+            node_bounds[0, i_node, d] = np.inf
+            node_bounds[1, i_node, d] = -np.inf
+        for i in range(idx_start, idx_end):
+            for d in range(n_features):
+                val = X[idx_array[i], d]
+                node_bounds[0, i_node, d] = min(node_bounds[0, i_node, d], val)
+                node_bounds[1, i_node, d] = max(node_bounds[1, i_node, d], val)
+
+        if 2 * i_node + 1 >= n_nodes:
+            node_data[i_node, 2] = 1
+            continue
+
+        # split on the widest dimension at the median
+        split_dim = 0
+        max_spread = -1.0
+        for d in range(n_features):
+            spread = node_bounds[1, i_node, d] - node_bounds[0, i_node, d]
+            if spread > max_spread:
+                max_spread = spread
+                split_dim = d
+        node_idx = idx_array[idx_start:idx_end].copy()
+        order = np.argsort(X[node_idx, split_dim])
+        idx_array[idx_start:idx_end] = node_idx[order]
+
+        idx_mid = idx_start + (idx_end - idx_start) // 2
+        node_data[2 * i_node + 1, 0] = idx_start
+        node_data[2 * i_node + 1, 1] = idx_mid
+        node_data[2 * i_node + 2, 0] = idx_mid
+        node_data[2 * i_node + 2, 1] = idx_end
+
+    return KDTree(X, idx_array, node_data, node_bounds)
+
+
+@njit(cache=True, fastmath=True)
+def _min_rdist(tree: KDTree, i_node: int, pt: NDArray) -> float:
+    """Squared distance from pt to the bounding box of a node."""
+    rdist = 0.0
+    for d in range(pt.shape[0]):
+        lo = tree.node_bounds[0, i_node, d] - pt[d]
+        hi = pt[d] - tree.node_bounds[1, i_node, d]
+        delta = max(lo, hi, 0.0)
+        rdist += delta * delta
+    return rdist
+
+
+@njit(cache=True, fastmath=True)
+def query_radius(tree: KDTree, pt: NDArray, eps: float, out: NDArray, weights: NDArray, max_weight: float) -> Tuple[int, float]:
+    """
+    Finds the points within eps of pt.
+
+    Args:
+        tree (KDTree): Tree returned by ``build_kdtree``.
+        pt (NDArray): (D,) query point.
+        eps (float): Neighborhood radius.
+        out (NDArray): Buffer receiving neighbor indices, unused if empty.
+        weights (NDArray): Weight of each point.
+        max_weight (float): Stop once the neighbors found weigh this much (0 = no limit).
+
+    Returns:
+        tuple: Number of neighbors found (written to the front of out) and their summed weight.
+    """
+    r_eps = eps * eps
+    n_features = pt.shape[0]
+    stack = np.empty(2 * tree.node_data.shape[0], dtype=np.int32)
+    stack[0] = 0
+    n_stack = 1
+    count = 0
+    weight = 0.0
+    while n_stack > 0:
+        n_stack -= 1
+        i_node = stack[n_stack]
+        if _min_rdist(tree, i_node, pt) > r_eps:
+            continue
+        if tree.node_data[i_node, 2] == 0:
+            stack[n_stack] = 2 * i_node + 1
+            stack[n_stack + 1] = 2 * i_node + 2
+            n_stack += 2
+            continue
+        for i in range(tree.node_data[i_node, 0], tree.node_data[i_node, 1]):
+            idx = tree.idx_array[i]
+            rdist = 0.0
+            for d in range(n_features):
+                delta = tree.data[idx, d] - pt[d]
+                rdist += delta * delta
+            if rdist <= r_eps:
+                if out.shape[0] > 0:
+                    out[count] = idx
+                count += 1
+                weight += weights[idx]
+                if max_weight > 0.0 and weight >= max_weight:
+                    return count, weight
+    return count, weight
+
+
+@njit(cache=True, parallel=True, fastmath=True)
+def _core_mask(tree: KDTree, eps: float, min_samples: int, weights: NDArray) -> NDArray:
+    """Flags points whose neighbors (self included) weigh at least min_samples."""
+    n_samples = tree.data.shape[0]
+    is_core = np.zeros(n_samples, dtype=np.bool_)
+    no_out = np.empty(0, dtype=np.int32)
+    for i in prange(n_samples):
+        is_core[i] = query_radius(tree, tree.data[i], eps, no_out, weights, min_samples)[1] >= min_samples
+    return is_core
+
+
+@njit(cache=True)
+def _expand_clusters(tree: KDTree, eps: float, is_core: NDArray, weights: NDArray) -> NDArray:
+    """Breadth-first cluster expansion from core points, as in sklearn's dbscan_inner."""
+    n_samples = tree.data.shape[0]
+    labels = np.full(n_samples, -1, dtype=np.int64)
+    neighbors = np.empty(n_samples, dtype=np.int32)
+    # only core points are queued and each is queued once, so N slots suffice
+    queue = np.empty(n_samples, dtype=np.int32)
+    label_num = 0
+    for i in range(n_samples):
+        if labels[i] != -1 or not is_core[i]:
+            continue
+        labels[i] = label_num
+        queue[0] = i
+        n_queue = 1
+        while n_queue > 0:
+            n_queue -= 1
+            j = queue[n_queue]
+            n_neighbors = query_radius(tree, tree.data[j], eps, neighbors, weights, 0.0)[0]
+            for k in range(n_neighbors):
+                v = neighbors[k]
+                if labels[v] == -1:
+                    labels[v] = label_num
+                    if is_core[v]:
+                        queue[n_queue] = v
+                        n_queue += 1
+        label_num += 1
+    return labels
+
+
+def dbscan_labels(
+    X: NDArray, eps: float, min_samples: int, sample_weight: Optional[NDArray] = None, leaf_size: int = 40
+) -> Tuple[NDArray, NDArray]:
+    """
+    Performs DBSCAN clustering, matching sklearn's labelling.
+
+    Args:
+        X (NDArray): (N, D) data to cluster.
+        eps (float): Neighborhood radius.
+        min_samples (int): Neighbors (self included) needed for a core point.
+        sample_weight (NDArray, optional): Weight of each sample, e.g. its number of duplicates. Defaults to 1.
+        leaf_size (int): Maximum number of points in a KD-tree leaf.
+
+    Returns:
+        tuple: Cluster labels (-1 for noise) and a boolean mask of core samples.
+    """
+    weights = np.ones(len(X)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+    tree = build_kdtree(np.ascontiguousarray(X), leaf_size)
+    is_core = _core_mask(tree, eps, min_samples, weights)
+    labels = _expand_clusters(tree, eps, is_core, weights)
+    return labels, is_core
@@ -0,0 +1,22 @@
+"""
+Display detection shared by the plotting tools.
+
+Figures are shown on screen when a display is available, otherwise they are
+rendered off-screen with the Agg backend and saved as PNG files.
+"""
+
+import os
+import sys
+
+
+def has_display() -> bool:
+    """
+    Checks whether figures can be shown on screen.
+    On Linux a display needs an X11 or Wayland session, other platforms are assumed to have one.
+
+    Returns:
+        bool: Whether a display is available.
+    """
+    if sys.platform.startswith('linux'):
+        return bool(os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+    return True
@@ -0,0 +1,36 @@
+"""
+Numba-compiled in-place standardization.
+
+Each column's mean and variance are found in a single Welford pass, and the
+column is then rescaled in place, so X is read twice and written once with no
+temporaries.
+"""
+
+from numba import njit, prange
+from numpy.typing import NDArray
+import numpy as np
+
+
+@njit(cache=True, parallel=True, fastmath=True)
+def welford_standardize(X: NDArray) -> None:
+    """
+    Standardizes each column of X in place to zero mean and unit variance, matching StandardScaler.
+
+    Args:
+        X (NDArray): (N, D) data, ideally column-major so each column is contiguous.
+    """
+    n_samples, n_features = X.shape
+    for d in prange(n_features):
+        mean = 0.0
+        m2 = 0.0
+        for i in range(n_samples):
+            x = np.float64(X[i, d])
+            delta = x - mean
+            mean += delta / (i + 1)
+            m2 += delta * (x - mean)
+        # population std like StandardScaler, constant columns are left unscaled
+        std = np.sqrt(m2 / n_samples) if n_samples > 0 else 0.0
+        if std == 0.0:
+            std = 1.0
+        for i in range(n_samples):
+            X[i, d] = (X[i, d] - mean) / std
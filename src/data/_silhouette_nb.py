@@ -0,0 +1,69 @@
+"""
+Numba-compiled silhouette coefficients.
+
+Pairwise distances are computed in blocks of rows and accumulated into
+per-cluster sums, so the distance matrix is never materialized.
+"""
+
+from numba import njit, prange
+from numpy.typing import NDArray
+import numpy as np
+
+
+BLOCK_SIZE: int = 64
+
+
+@njit(cache=True, parallel=True, fastmath=True)
+def silhouette_samples_nb(X: NDArray, labels: NDArray, n_clusters: int, weights: NDArray, rows: NDArray) -> NDArray:
+    """
+    Computes the silhouette coefficient of the given rows against all of X, matching sklearn's silhouette_samples.
+    A sample with weight w counts as w identical samples.
+
+    Args:
+        X (NDArray): (N, D) clustered data.
+        labels (NDArray): Cluster label of each sample, in [0, n_clusters).
+        n_clusters (int): Number of clusters.
+        weights (NDArray): Weight of each sample, e.g. its number of duplicates.
+        rows (NDArray): Indices of the samples to score.
+
+    Returns:
+        NDArray: Silhouette coefficient of each sample in rows.
+    """
+    n_samples, n_features = X.shape
+    n_rows = rows.shape[0]
+    cluster_sizes = np.zeros(n_clusters)
+    for j in range(n_samples):
+        cluster_sizes[labels[j]] += weights[j]
+    n_blocks = (n_rows + BLOCK_SIZE - 1) // BLOCK_SIZE
+    scores = np.zeros(n_rows)
+
+    for block in prange(n_blocks):
+        start = block * BLOCK_SIZE
+        stop = min(start + BLOCK_SIZE, n_rows)
+        # summed distance from each row of the block to every cluster
+        dist_sums = np.zeros((stop - start, n_clusters))
+        for j in range(n_samples):
+            label_j = labels[j]
+            weight_j = weights[j]
+            for r in range(start, stop):
+                i = rows[r]
+                rdist = 0.0
+                for d in range(n_features):
+                    delta = X[i, d] - X[j, d]
+                    rdist += delta * delta
+                dist_sums[r - start, label_j] += weight_j * np.sqrt(rdist)
+
+        for r in range(start, stop):
+            label_i = labels[rows[r]]
+            n_same = cluster_sizes[label_i]
+            if n_same <= 1:
+                continue  # silhouette of a singleton cluster is 0
+            a = dist_sums[r - start, label_i] / (n_same - 1)
+            b = np.inf
+            for k in range(n_clusters):
+                if k != label_i and cluster_sizes[k] > 0:
+                    b = min(b, dist_sums[r - start, k] / cluster_sizes[k])
+            denom = max(a, b)
+            scores[r] = (b - a) / denom if denom > 0.0 else 0.0
+
+    return scores
@@ -6,25 +6,103 @@ from log files for different scenarios.
 """
 
 import argparse
-from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 
+from joblib import Parallel, delayed
 from numpy.typing import NDArray
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from sklearn.cluster import DBSCAN, KMeans
-from sklearn.metrics import silhouette_score
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics import pairwise_distances_chunked
 import numpy as np
-import matplotlib.pyplot as plt
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.feather as pafeather
+
+try:
+    # Intel's oneDAL-backed drop-in estimators, vectorized for AVX-512, if scikit-learn-intelex is installed
+    from sklearnex.cluster import DBSCAN, KMeans
+    from sklearnex.neighbors import NearestNeighbors
+except ImportError:
+    from sklearn.cluster import DBSCAN, KMeans
+    from sklearn.neighbors import NearestNeighbors
+
+from src.data._display import has_display
+
+try:
+    from src.data._dbscan_nb import dbscan_labels
+    from src.data._scale_nb import welford_standardize
+    from src.data._silhouette_nb import silhouette_samples_nb
+    HAS_NUMBA: bool = True
+except ImportError:
+    # without numba, DBSCAN and silhouette analysis fall back to scikit-learn, scaling to NumPy
+    HAS_NUMBA = False
+
+try:
+    import polars as pl
+    # the streaming engine of LazyFrame.collect() needs Polars 1.23
+    HAS_POLARS: bool = tuple(int(part) for part in pl.__version__.split('.')[:2]) >= (1, 23)
+except ImportError:
+    # without Polars, logs are parsed file by file with pyarrow.csv
+    HAS_POLARS = False
+
+try:
+    import cupy as cp
+    from cuml.cluster import DBSCAN as cuDBSCAN, KMeans as cuKMeans
+    from cuml.metrics.cluster import silhouette_score as cu_silhouette_score
+    HAS_CUML: bool = cp.cuda.is_available()
+except ImportError:
+    # without cuML and a CUDA GPU, clustering runs on the CPU
+    HAS_CUML = False
+
+
+def _pyplot():
+    """
+    Imports pyplot on first use, so runs that never plot skip the matplotlib import.
+    Without a display figures cannot be shown, so the off-screen Agg backend is used.
+
+    Returns:
+        module: matplotlib.pyplot
+    """
+    import matplotlib
+    if not has_display() and 'MPLBACKEND' not in os.environ:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _can_show() -> bool:
+    """
+    Returns:
+        bool: Whether the active matplotlib backend can display figures.
+    """
+    import matplotlib
+    return matplotlib.get_backend().lower() != 'agg'
 
 
 class DataClusterer:
 
     DATA_COLS: List[str] = ['speed', 'heart_rate', 'breathing_rate']
-
-    def __init__(self, scenarios: List[str], logs_dir: str, data_cols: Optional[List[str]] = None) -> None:
+    # silhouette analysis is estimated from this many points per cluster, each scored against all the data
+    SILHOUETTE_SAMPLES_PER_CLUSTER: int = 512
+    # cuML's silhouette score is quadratic in the number of samples, so on the GPU it uses a random subsample
+    SILHOUETTE_SAMPLE_SIZE: int = 10_000
+    # plotted points are thinned to one per cluster (and DBSCAN core flag) per cell of a PLOT_GRID_SIZE^2 grid
+    PLOT_GRID_SIZE: int = 100
+    # rows equal up to this many decimals (after normalization) are clustered once, weighted by their count
+    DEDUP_DECIMALS: int = 3
+    # above this many samples PCA is fitted in batches of PCA_BATCH_SIZE rows, bounding its working memory
+    INCREMENTAL_PCA_MIN_SAMPLES: int = 50_000
+    PCA_BATCH_SIZE: int = 8192
+
+    def __init__(
+        self, scenarios: List[str], logs_dir: str, data_cols: Optional[List[str]] = None, use_gpu: bool = True
+    ) -> None:
         """
         Clusters data from log files using the DBSCAN or KMeans++ algorithm.
 
@@ -32,108 +110,258 @@ class DataClusterer:
             scenario_name (str): The name of the scenario.
             logs_dir (str): Directory containing log files.
             data_cols (List[str]): Columns to include in clustering.
+            use_gpu (bool): Cluster on the GPU with cuML when it is available.
         """
 
         self.scenarios: List[str] = scenarios
         self.logs_dir: str = logs_dir
         self.data_cols: List[str] = data_cols or DataClusterer.DATA_COLS
+        self.use_gpu: bool = use_gpu and HAS_CUML
+        self._log_files: Dict[str, List[Path]] = {}
         if len(self.scenarios) == 1:
             self.scenario = self.scenarios[0]
             self.data: pd.DataFrame = self._load_data().reset_index(drop=True)
-            self.data[self.data_cols] = self.data[self.data_cols] \
-                .apply(pd.to_numeric, errors='coerce')
             self.data = self.data.dropna(subset=self.data_cols)
 
             # modify DBSCAN hyperparameters here
-            self.dbscan: DBSCAN = DBSCAN(eps=1.0, min_samples=500)
+            self.dbscan_eps: float = 1.0
+            self.dbscan_min_samples: int = 500
 
             self.labels: Optional[NDArray] = None
+            self.core_samples_mask: Optional[NDArray] = None
+            self._norm_cache: Optional[NDArray] = None
+            self._matrix_cache: Dict[int, Tuple[NDArray, NDArray, NDArray, NDArray]] = {}
+
+    @staticmethod
+    def _read_log(file: Path, data_cols: List[str], include_time: bool, use_threads: bool = True) -> pa.Table:
+        """
+        Reads a CSV or Feather log file and returns its float32 data columns as an Arrow table.
+
+        Args:
+            file (Path): Path to the log file.
+            data_cols (List[str]): Data columns to read.
+            include_time (bool): Whether to also read the "time_seconds" column.
+            use_threads (bool): Whether Arrow may parse the file with multiple threads.
+
+        Returns:
+            pa.Table: Table containing the data from the log file.
+        """
+        logging.debug('Reading "%s"', file.name)
+        columns: List[str] = ['time_seconds', *data_cols] if include_time else data_cols
+        is_feather: bool = file.suffix == '.feather'
+        try:
+            if is_feather:
+                table: pa.Table = pafeather.read_table(file, columns=columns, use_threads=use_threads)
+                return table.cast(pa.schema([
+                    (col, pa.float32() if col in data_cols else table.schema.field(col).type) for col in columns
+                ]))
+            return pacsv.read_csv(
+                file,
+                read_options=pacsv.ReadOptions(use_threads=use_threads),
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=columns,
+                    column_types={col: pa.float32() for col in data_cols}
+                )
+            )
+        except pa.ArrowInvalid:
+            # only logs holding invalid entries (e.g. bad biometrics) need coercing, NaNs are dropped later
+            if is_feather:
+                data: pd.DataFrame = pd.read_feather(file, columns=columns)
+            else:
+                data = pd.read_csv(file, usecols=columns, engine='pyarrow')[columns]
+            for col in data_cols:
+                if not pd.api.types.is_numeric_dtype(data[col]):
+                    data[col] = pd.to_numeric(data[col], errors='coerce')
+            return pa.Table.from_pandas(data.astype({col: np.float32 for col in data_cols}), preserve_index=False)
 
-    def _read_csv(self, file: Path, data_col: Optional[str] = None) -> pd.DataFrame:
+    def _find_logs(self, scenario: str) -> List[Path]:
         """
-        Reads a CSV file and returns a DataFrame.
+        Finds the log files matching a scenario name, scanning the logs directory only once per scenario.
+        A log present both as CSV and as Feather is read from the Feather file, unless the CSV is newer.
 
         Args:
-            file (Path): Path to the CSV file.
+            scenario (str): The name of the scenario.
 
         Returns:
-            pd.DataFrame: DataFrame containing the data from the CSV file.
+            List[Path]: Paths to the matched log files.
         """
-        print(f'Reading "{file.name}"')
-        data_cols: List[str] = [data_col] if data_col else ['time_seconds', *self.data_cols]
-        return pd.read_csv(file, usecols=data_cols)
+        if scenario not in self._log_files:
+            logs: Dict[str, Dict[str, os.DirEntry]] = {}
+            # scandir yields names and file types without a stat call per entry
+            with os.scandir(self.logs_dir) as entries:
+                for entry in entries:
+                    if scenario not in entry.name or not entry.is_file():
+                        continue
+                    stem, suffix = os.path.splitext(entry.name)
+                    if suffix in ('.csv', '.feather'):
+                        logs.setdefault(stem, {})[suffix] = entry
+            files = []
+            for found in logs.values():
+                feather, csv = found.get('.feather'), found.get('.csv')
+                # a Feather file older than its CSV log is stale
+                stale = feather is not None and csv is not None and feather.stat().st_mtime_ns < csv.stat().st_mtime_ns
+                files.append(Path((csv if feather is None or stale else feather).path))
+            self._log_files[scenario] = sorted(files)
+        return self._log_files[scenario]
 
     def _load_data(self, scenario: Optional[str] = None, data_col: Optional[str] = None) -> pd.DataFrame:
         """
         Loads data from all CSV files matching the scenario name in the logs directory.
+        With Polars all files are scanned as one lazy, streaming query that only parses the needed columns.
+        Otherwise files are parsed in parallel threads and concatenated as Arrow tables before a single conversion to pandas.
 
         Returns:
             pd.DataFrame: Concatenated DataFrame containing data from all matched files.
         """
-        data: pd.DataFrame = pd.concat([
-            self._read_csv(f, data_col) for f in Path(self.logs_dir).glob(f'*{scenario or self.scenario}*')
-        ], ignore_index=True)
+        files: List[Path] = self._find_logs(scenario or self.scenario)
+        data_cols: List[str] = [data_col] if data_col else self.data_cols
+        if HAS_POLARS:
+            columns: List[str] = ['time_seconds', *data_cols] if data_col is None else data_cols
+            csv_files: List[Path] = [f for f in files if f.suffix == '.csv']
+            feather_files: List[Path] = [f for f in files if f.suffix == '.feather']
+            # invalid entries (e.g. bad biometrics) are read as nulls and dropped later
+            scans: List[pl.LazyFrame] = []
+            if csv_files:
+                scans.append(pl.scan_csv(
+                    csv_files,
+                    schema_overrides={col: pl.Float32 for col in data_cols},
+                    ignore_errors=True
+                ).select(columns))
+            # Feather logs are scanned one by one, a column holding invalid entries is stored as strings
+            scans.extend(
+                pl.scan_ipc(f).select(columns).with_columns(pl.col(data_cols).cast(pl.Float32, strict=False))
+                for f in feather_files
+            )
+            data: pd.DataFrame = pl.concat(scans).collect(engine='streaming').to_pandas()
+            print(f'Read {len(data)} samples.')
+            return data
+        if len(files) > 1:
+            # Arrow releases the GIL while parsing, so threads read files in parallel without process startup costs.
+            # Files are already read in parallel, so each thread parses with a single Arrow thread
+            with ThreadPoolExecutor(max_workers=min(len(files), os.cpu_count() or 1)) as executor:
+                tables: List[pa.Table] = list(executor.map(
+                    DataClusterer._read_log, files, repeat(data_cols), repeat(data_col is None), repeat(False)
+                ))
+        else:
+            tables = [DataClusterer._read_log(f, data_cols, data_col is None) for f in files]
+        table: pa.Table = pa.concat_tables(tables)
+        del tables
+        # each Arrow column is released as soon as it is converted, so the data is never held twice
+        data: pd.DataFrame = table.to_pandas(split_blocks=True, self_destruct=True)
+        del table
         print(f'Read {len(data)} samples.')
         return data
 
     def _normalize_data(self) -> NDArray:
         """
-        Normalizes the data using StandardScaler.
+        Standardizes each data column to zero mean and unit variance.
+        The result is cached until the rows of the data change.
 
         Returns:
-            NDArray: Normalized data.
+            NDArray: Normalized float32 data in column-major (one column per feature) layout.
         """
-        scaler: StandardScaler = StandardScaler()
-        return scaler.fit_transform(self.data[self.data_cols])
+        if self._norm_cache is not None:
+            return self._norm_cache
+        vals: NDArray = np.array(self.data[self.data_cols].to_numpy(), dtype=np.float32, order='F')
+        if HAS_NUMBA:
+            welford_standardize(vals)
+        else:
+            mean: NDArray = vals.mean(axis=0)
+            std: NDArray = vals.std(axis=0)
+            std[std == 0.0] = 1.0  # same as StandardScaler for constant columns
+            np.subtract(vals, mean, out=vals)
+            np.divide(vals, std, out=vals)
+        self._norm_cache = vals
+        return vals
+
+    def _prepare_matrix(self, n_pca_comp: Optional[int]) -> Tuple[NDArray, NDArray, NDArray, NDArray]:
+        """
+        Normalizes the data, optionally reduces it with PCA and deduplicates its rows.
+        Results are cached per number of PCA components until the rows of the data change,
+        so running several clustering algorithms does the work once.
+
+        Args:
+            n_pca_comp (Optional[int]): Number of PCA components, None to skip PCA.
+
+        Returns:
+            tuple: Clustering input, its unique rows, index of the unique row for every input row,
+                and the count of each unique row.
+        """
+        norm_data: NDArray = self._normalize_data()
+        # PCA keeping every dimension is only a rotation, so it is skipped
+        if not (isinstance(n_pca_comp, int) and 0 < n_pca_comp < norm_data.shape[1]):
+            n_pca_comp = norm_data.shape[1]
+        if n_pca_comp not in self._matrix_cache:
+            if n_pca_comp < norm_data.shape[1]:
+                if len(norm_data) > DataClusterer.INCREMENTAL_PCA_MIN_SAMPLES:
+                    pca = IncrementalPCA(n_components=n_pca_comp, batch_size=DataClusterer.PCA_BATCH_SIZE)
+                else:
+                    pca = PCA(n_components=n_pca_comp, svd_solver='randomized', random_state=0)
+                norm_data = pca.fit_transform(norm_data).astype(np.float32, copy=False)
+            # cluster each distinct row once, weighted by its number of duplicates
+            self._matrix_cache[n_pca_comp] = (norm_data, *DataClusterer._unique_rows(norm_data))
+        return self._matrix_cache[n_pca_comp]
 
     def _plot_clusters(self, X: NDArray, n_clusters: int, is_dbscan: bool) -> None:
         """
         Plots clusters in a scatter plot.
+        Overlapping markers are thinned to one random point per cluster per grid cell,
+        which keeps each cluster's shape and outliers. All clusters are drawn with a single scatter call.
 
         Args:
             X (NDArray): Data to plot.
             n_clusters (int): Number of clusters.
         """
-        unique_labels = set(self.labels)
-        if is_dbscan:
-            core_samples_mask = np.zeros_like(self.labels, dtype=bool)
-            core_samples_mask[self.dbscan.core_sample_indices_] = True
-        colors = [plt.cm.Spectral(each) for each in np.linspace(0, 1, len(unique_labels))]
-
-        for k, color in zip(unique_labels, colors):
-            if k == -1:
-                # Black used for noise.
-                color = [0, 0, 0, 1]
-                label = 'Noise'
-            else:
-                label = f'Cluster {k}'
-
-            class_member_mask = self.labels == k
-            xy = X[class_member_mask]
-            plt.plot(
-                xy[:, 0], xy[:, 1],
+        plt = _pyplot()
+        from matplotlib.lines import Line2D
+
+        unique_labels = np.unique(self.labels)
+        # labels are shifted by one to index the color table, black is used for noise (label -1)
+        color_table = np.vstack([[0, 0, 0, 1], plt.cm.Spectral(np.linspace(0, 1, unique_labels.max() + 1))])
+
+        grid_size: int = DataClusterer.PLOT_GRID_SIZE
+        xy: NDArray = X[:, :2]
+        lo: NDArray = xy.min(axis=0)
+        extent: NDArray = xy.max(axis=0) - lo
+        cells: NDArray = ((xy - lo) / np.where(extent > 0, extent, 1) * (grid_size - 1)).astype(np.int64)
+        is_core: NDArray = self.core_samples_mask if is_dbscan else np.zeros(len(self.labels), dtype=bool)
+        keys: NDArray = ((self.labels + 1) * 2 + is_core) * grid_size**2 + cells[:, 0] * grid_size + cells[:, 1]
+        # the first occurrence of each key in a shuffled order is a random point of its cell
+        order: NDArray = np.random.default_rng(0).permutation(len(keys))
+        idx: NDArray = order[np.unique(keys[order], return_index=True)[1]]
+        # non-core DBSCAN samples are drawn smaller
+        sizes = np.where(self.core_samples_mask[idx], 14**2, 6**2) if is_dbscan else 14**2
+
+        fig, ax = plt.subplots()
+        ax.scatter(
+            X[idx, 0], X[idx, 1],
+            s=sizes,
+            c=color_table[self.labels[idx] + 1],
+            edgecolors='k',
+            rasterized=True
+        )
+        handles = [
+            Line2D(
+                [], [],
+                linestyle='',
                 marker='o',
-                markerfacecolor=tuple(color),
+                markerfacecolor=color_table[k + 1],
                 markeredgecolor='k',
                 markersize=14,
-                label=label
-            )
-            if is_dbscan:
-                xy = X[class_member_mask & ~core_samples_mask]
-                plt.plot(
-                    xy[:, 0], xy[:, 1],
-                    marker='o',
-                    markerfacecolor=tuple(color),
-                    markeredgecolor='k',
-                    markersize=6
-                )
+                label='Noise' if k == -1 else f'Cluster {k}'
+            ) for k in unique_labels
+        ]
 
         algo_name = 'DBSCAN' if is_dbscan else 'KMeans++'
-        plt.title(f'{algo_name} estimated number of clusters: {n_clusters}')
-        plt.legend()
-        plt.show()
+        ax.set_title(f'{algo_name} estimated number of clusters: {n_clusters}')
+        ax.legend(handles=handles)
+        if _can_show():
+            plt.show()
+        else:
+            fig.savefig(f'clusters_{algo_name.lower()}_{self.scenario}.png')
 
     def boxplots_summary(self) -> None:
+        plt = _pyplot()
         data_units: Dict[str, str] = {
             'speed': 'km/h',
             'heart_rate': 'beats/min',
@@ -142,13 +370,16 @@ class DataClusterer:
             'brake': '',
             'steer': ''
         }
+        # every scenario is loaded once with all data columns and split per column below
+        all_scenario_data: Dict[str, pd.DataFrame] = {
+            scenario: self._load_data(scenario) for scenario in self.scenarios
+        }
         for col in self.data_cols:
-            all_scenario_data: List[pd.DataFrame] = [
-                self._load_data(scenario, col) for scenario in self.scenarios
-            ]
-            for scenario_data, scenario in zip(all_scenario_data, self.scenarios):
-                scenario_data.insert(0, 'scenario', [scenario] * len(scenario_data))
-            data: pd.DataFrame = pd.concat(all_scenario_data)
+            data: pd.DataFrame = pd.concat(
+                [all_scenario_data[scenario][[col]] for scenario in self.scenarios],
+                keys=self.scenarios,
+                names=['scenario']
+            )
             fig, ax = plt.subplots(figsize=(len(self.scenarios), 8))
             data.boxplot(
                 by='scenario',
@@ -165,7 +396,8 @@ class DataClusterer:
             fig.suptitle(f'Data Summary for {col.replace("_", " ").title()}')
             fig.tight_layout()
             plt.savefig(f'summ_{col}_new.png')
-        plt.show()
+        if _can_show():
+            plt.show()
 
     def cluster_DBSCAN(self, n_pca_comp: Optional[int], plot_results: bool) -> None:
         """
@@ -175,17 +407,44 @@ class DataClusterer:
             use_PCA (bool): Whether to use PCA for dimensionality reduction.
             plot_results (bool): Whether to plot the clustering results.
         """
-        norm_data: NDArray = self._normalize_data()
-        use_pca: bool = isinstance(n_pca_comp, int) and n_pca_comp > 0
-        if use_pca:
-            pca = PCA(n_components=n_pca_comp)
-            norm_data = pca.fit_transform(norm_data)
-        self.labels = self.dbscan.fit_predict(norm_data)
-
-        n_clusters = len(set(self.labels)) - (1 if -1 in self.labels else 0)
-        n_noise = list(self.labels).count(-1)
+        norm_data, uniq_data, inverse, counts = self._prepare_matrix(n_pca_comp)
+        use_pca: bool = norm_data.shape[1] < len(self.data_cols)
+        if self.use_gpu:
+            dbscan = cuDBSCAN(
+                eps=self.dbscan_eps,
+                min_samples=self.dbscan_min_samples,
+                calc_core_sample_indices=True,
+                output_type='numpy'
+            )
+            labels = dbscan.fit_predict(cp.asarray(uniq_data), sample_weight=cp.asarray(counts, dtype=cp.float32))
+            core_samples_mask = np.zeros(len(labels), dtype=bool)
+            core_samples_mask[dbscan.core_sample_indices_] = True
+        elif HAS_NUMBA:
+            labels, core_samples_mask = dbscan_labels(
+                uniq_data, self.dbscan_eps, self.dbscan_min_samples, sample_weight=counts
+            )
+        else:
+            # eps-neighborhoods are found once with a KD-tree and kept as a sparse distance graph
+            nn = NearestNeighbors(radius=self.dbscan_eps, algorithm='kd_tree', leaf_size=40, n_jobs=-1)
+            graph = nn.fit(uniq_data).radius_neighbors_graph(mode='distance')
+            dbscan: DBSCAN = DBSCAN(
+                eps=self.dbscan_eps,
+                min_samples=self.dbscan_min_samples,
+                metric='precomputed',
+                n_jobs=-1
+            )
+            labels = dbscan.fit_predict(graph, sample_weight=counts)
+            core_samples_mask = np.zeros(len(labels), dtype=bool)
+            core_samples_mask[dbscan.core_sample_indices_] = True
+        self.labels = labels[inverse]
+        self.core_samples_mask = core_samples_mask[inverse]
+
+        # one pass over the labels, shifted by one so noise (-1) is counted in bin 0
+        label_counts: NDArray = np.bincount(self.labels + 1)
+        n_noise = int(label_counts[0])
+        n_clusters = int(np.count_nonzero(label_counts[1:]))
         print('\nDBSCAN:')
-        print(f'PCA components: {pca.components_.shape[0] if use_pca else "N/A"}')
+        print(f'PCA components: {norm_data.shape[1] if use_pca else "N/A"}')
         print(f'Estimated number of clusters: {n_clusters}')
         print(f'Estimated number of noise points: {n_noise}\n')
 
@@ -202,40 +461,44 @@ class DataClusterer:
             plot_results (bool): Whether to plot the clustering results.
             compute_parallel (bool): Calculate optimal clusters much faster with parallel computing
         """
-        norm_data: NDArray = self._normalize_data()
-        use_pca: bool = isinstance(n_pca_comp, int) and n_pca_comp > 0
-        if use_pca:
-            pca = PCA(n_components=n_pca_comp)
-            norm_data = pca.fit_transform(norm_data)
+        norm_data, uniq_data, inverse, counts = self._prepare_matrix(n_pca_comp)
+        use_pca: bool = norm_data.shape[1] < len(self.data_cols)
 
         range_n_clusters = list(range(2, 10))
-        silhouette_scores = []
-        cluster_labels = []
         print('\nKMeans++:')
 
-        # Use ProcessPoolExecutor for parallel processing
-        if compute_parallel:
-            futures = []
-            with ProcessPoolExecutor() as executor:
-                for clusters in range_n_clusters:
-                    futures.append(executor.submit(
-                        DataClusterer.kmeans_clustering, norm_data, clusters
-                    ))
-
-            for future in futures:
-                labels, score = future.result()
-                cluster_labels.append(labels)
-                silhouette_scores.append(score)
+        if self.use_gpu:
+            # the data is uploaded once and stays on the GPU for every fit
+            gpu_data = cp.asarray(uniq_data)
+            results = [
+                DataClusterer.kmeans_clustering_gpu(gpu_data, clusters, counts)
+                for clusters in range_n_clusters
+            ]
+        # Use joblib for parallel processing, arrays above max_nbytes are memory-mapped
+        # so the workers share the data instead of each receiving a pickled copy.
+        # There is at most one loky worker per cluster count, so no worker sits idle
+        elif compute_parallel:
+            n_jobs = min(len(range_n_clusters), os.cpu_count() or 1)
+            results = Parallel(n_jobs=n_jobs, backend='loky', max_nbytes='1M')(
+                delayed(DataClusterer.kmeans_clustering)(uniq_data, clusters, counts)
+                for clusters in range_n_clusters
+            )
         else:
-            for clusters in range_n_clusters:
-                labels, score = DataClusterer.kmeans_clustering(norm_data, clusters)
-                cluster_labels.append(labels)
-                silhouette_scores.append(score)
+            results = [
+                DataClusterer.kmeans_clustering(uniq_data, clusters, counts)
+                for clusters in range_n_clusters
+            ]
+        cluster_labels, silhouette_scores = zip(*results)
 
         # Determine the optimal number of clusters based on silhouette score
         optimal_clusters = range_n_clusters[np.argmax(silhouette_scores)]
-        self.labels = cluster_labels[np.argmax(silhouette_scores)]
-        print(f'PCA components: {pca.components_.shape[0] if use_pca else "N/A"}')
+        if self.use_gpu:
+            self.labels = cluster_labels[np.argmax(silhouette_scores)][inverse]
+        else:
+            # the sweep only ranks cluster counts with MiniBatchKMeans, the final labels come from a full-batch fit
+            kmeans = KMeans(n_clusters=optimal_clusters, init='k-means++', n_init=10, random_state=0)
+            self.labels = kmeans.fit_predict(uniq_data, sample_weight=counts)[inverse]
+        print(f'PCA components: {norm_data.shape[1] if use_pca else "N/A"}')
         print(f'Optimal number of clusters (Silhouette Analysis): {optimal_clusters}')
         # KMeans++ does not differentiate noise! Importatnt distinction from DBSCAN
         print('Estimated number of noise points: N/A\n')
@@ -247,30 +510,39 @@ class DataClusterer:
         """
         Summarizes the clustering results with a cluster summary and box plots.
         """
-        self.data['cluster'] = self.labels
+        plt = _pyplot()
 
         # drop noisy data
-        self.data.loc[self.data['cluster'] == -1, 'cluster'] = np.nan
-        self.data = self.data.dropna(subset=['cluster'])
-        self.data['cluster'] = self.data['cluster'].astype(np.int64)
+        keep: NDArray = self.labels != -1
+        # int32 cluster ids keep the groupby keys narrow
+        self.data = self.data.iloc[keep].assign(cluster=self.labels[keep].astype(np.int32))
+        self._norm_cache = None
+        self._matrix_cache.clear()
 
         cluster_summary = self.data.groupby('cluster')[self.data_cols].agg(['mean', 'var'])
 
         print('\nCluster Summary:')
         print(cluster_summary, end='\n\n')
 
+        from matplotlib.cbook import boxplot_stats
+
         n_data_cols: int = len(self.data_cols)
         fig, axes = plt.subplots(1, n_data_cols, figsize=(n_data_cols * 4, 6))
 
+        # rows are split by cluster once and every column's box statistics reuse the split
+        cluster_ids: NDArray = self.data['cluster'].to_numpy()
+        order: NDArray = np.argsort(cluster_ids, kind='stable')
+        clusters, starts = np.unique(cluster_ids[order], return_index=True)
+
         for i, column in enumerate(self.data_cols):
             ax = axes[i]
-            self.data.boxplot(
-                column=column, by='cluster',
-                ax=axes[i],
-                vert=True,
-                grid=False,
+            values: List[NDArray] = np.split(self.data[column].to_numpy()[order], starts[1:])
+            # same styling as DataFrame.boxplot
+            ax.bxp(
+                boxplot_stats(values, labels=clusters),
                 patch_artist=True,
-                boxprops={'facecolor': 'lightblue'}
+                boxprops={'facecolor': 'lightblue'},
+                medianprops={'color': '0.7'}
             )
 
             ax.set_title(f'Box plot of {column} by cluster')
@@ -280,36 +552,171 @@ class DataClusterer:
 
         fig.suptitle(f'Clustering for scenario "{self.scenario}"')
         fig.tight_layout()
-        plt.show()
+        if _can_show():
+            plt.show()
+        else:
+            fig.savefig(f'summ_clusters_{self.scenario}.png')
+
+    @staticmethod
+    def _unique_rows(X: NDArray) -> Tuple[NDArray, NDArray, NDArray]:
+        """
+        Collapses rows that are equal after rounding to DEDUP_DECIMALS decimals.
+
+        Args:
+            X (NDArray): Data to deduplicate.
+
+        Returns:
+            tuple: Unique rows, index of the unique row for every row of X, and the count of each unique row.
+        """
+        uniq, inverse, counts = np.unique(
+            X.round(DataClusterer.DEDUP_DECIMALS), axis=0, return_inverse=True, return_counts=True
+        )
+        return uniq, inverse.reshape(-1), counts
+
+    @staticmethod
+    def _silhouette_sample(sample_weight: NDArray) -> NDArray:
+        """
+        Draws at most SILHOUETTE_SAMPLE_SIZE samples, without replacement and uniformly over
+        the samples that the weighted rows stand for.
+
+        Args:
+            sample_weight (NDArray): Number of samples each row stands for.
+
+        Returns:
+            NDArray: Number of samples drawn from each row.
+        """
+        if sample_weight.sum() <= DataClusterer.SILHOUETTE_SAMPLE_SIZE:
+            return sample_weight
+        return np.random.default_rng(0).multivariate_hypergeometric(
+            sample_weight, DataClusterer.SILHOUETTE_SAMPLE_SIZE
+        )
+
+    @staticmethod
+    def _pps_silhouette(X: NDArray, labels: NDArray, n_clusters: int, sample_weight: NDArray) -> float:
+        """
+        Estimates the mean silhouette coefficient in linear time.
+        From each cluster SILHOUETTE_SAMPLES_PER_CLUSTER rows are drawn with probability proportional
+        to their weight, their exact silhouettes against all of X are averaged per cluster, and the
+        cluster means are combined weighted by cluster size. The estimate is unbiased.
+
+        Args:
+            X (NDArray): Clustered data.
+            labels (NDArray): Cluster label of each row, in [0, n_clusters).
+            n_clusters (int): Number of clusters.
+            sample_weight (NDArray): Number of samples each row of X stands for.
+
+        Returns:
+            float: Estimated mean silhouette coefficient.
+        """
+        weights: NDArray = sample_weight.astype(np.float64)
+        cluster_sizes: NDArray = np.bincount(labels, weights=weights, minlength=n_clusters)
+        rng = np.random.default_rng(0)
+        rows = []
+        for k in np.flatnonzero(cluster_sizes):
+            members = np.flatnonzero(labels == k)
+            rows.append(rng.choice(
+                members, DataClusterer.SILHOUETTE_SAMPLES_PER_CLUSTER, p=weights[members] / cluster_sizes[k]
+            ))
+        rows = np.concatenate(rows)
+
+        if HAS_NUMBA:
+            scores = silhouette_samples_nb(X, labels, n_clusters, weights, rows)
+        else:
+            # weighted distance sums from each sampled row to every cluster, one chunk of rows at a time
+            cluster_weights = np.zeros((len(X), n_clusters))
+            cluster_weights[np.arange(len(X)), labels] = weights
+            dist_sums = np.vstack(list(pairwise_distances_chunked(
+                X[rows], X, reduce_func=lambda chunk, _: chunk @ cluster_weights, n_jobs=-1
+            )))
+            own = labels[rows]
+            own_sizes = cluster_sizes[own]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                a = dist_sums[np.arange(len(rows)), own] / (own_sizes - 1)
+                mean_dists = dist_sums / cluster_sizes
+            mean_dists[:, cluster_sizes == 0] = np.inf
+            mean_dists[np.arange(len(rows)), own] = np.inf
+            b = mean_dists.min(axis=1)
+            denom = np.maximum(a, b)
+            # silhouette of a singleton cluster is 0
+            scores = np.where((own_sizes > 1) & (denom > 0.0), (b - a) / np.where(denom > 0.0, denom, 1.0), 0.0)
+
+        n_rows_per_cluster: NDArray = np.bincount(labels[rows], minlength=n_clusters)
+        score_sums: NDArray = np.bincount(labels[rows], weights=scores, minlength=n_clusters)
+        drawn = n_rows_per_cluster > 0
+        cluster_means: NDArray = score_sums[drawn] / n_rows_per_cluster[drawn]
+        return float((cluster_sizes[drawn] * cluster_means).sum() / cluster_sizes.sum())
 
     @staticmethod
-    def kmeans_clustering(norm_data, n_clusters):
+    def kmeans_clustering(norm_data, n_clusters, sample_weight):
         """
-        Performs KMeans++ clustering and does silhouette analysis on results
-        
+        Performs KMeans++ clustering and does silhouette analysis on results.
+        The silhouette score is estimated with DataClusterer._pps_silhouette.
+
         Args:
             norm_data (NDArrray): normalized input data
             n_clusters (int): number of clusters for KMeans++
+            sample_weight (NDArray): number of samples each row of norm_data stands for
 
         Returns:
             tuple: NDArray of clustered labels and the silhouette score
         """
         print(f'performing KMeans++ with {n_clusters} clusters...')
-        kmeans = KMeans(n_clusters=n_clusters, init='k-means++')
-        cluster_labels = kmeans.fit_predict(norm_data)
+        kmeans = MiniBatchKMeans(
+            n_clusters=n_clusters,
+            init='k-means++',
+            batch_size=4096,
+            n_init=3,
+            max_iter=100,
+            reassignment_ratio=0.01,
+            random_state=0
+        )
+        cluster_labels = kmeans.fit_predict(norm_data, sample_weight=sample_weight)
 
         # Calculate silhouette score (silhouette analysis)
-        cluster_score = silhouette_score(norm_data, cluster_labels)
+        cluster_score = DataClusterer._pps_silhouette(norm_data, cluster_labels, n_clusters, sample_weight)
         print(f'silhouette score for {n_clusters} clusters = {cluster_score}')
         return cluster_labels, cluster_score
 
+    @staticmethod
+    def kmeans_clustering_gpu(gpu_data, n_clusters, sample_weight):
+        """
+        Performs KMeans++ clustering and silhouette analysis on the GPU with cuML.
+        Only the cluster labels are copied back to the host.
+
+        Args:
+            gpu_data (cupy.ndarray): normalized input data, already on the GPU
+            n_clusters (int): number of clusters for KMeans++
+            sample_weight (NDArray): number of samples each row of gpu_data stands for
+
+        Returns:
+            tuple: NDArray of clustered labels and the silhouette score
+        """
+        print(f'performing KMeans++ with {n_clusters} clusters...')
+        kmeans = cuKMeans(
+            n_clusters=n_clusters,
+            init='k-means++',
+            n_init=3,
+            max_iter=100,
+            random_state=0,
+            output_type='cupy'
+        )
+        cluster_labels = kmeans.fit_predict(gpu_data, sample_weight=cp.asarray(sample_weight, dtype=cp.float32))
+
+        # cuML's silhouette score is unweighted, so sampled rows are repeated by their sample count
+        weights = DataClusterer._silhouette_sample(sample_weight)
+        sampled = np.flatnonzero(weights)
+        sample_idx = cp.asarray(np.repeat(sampled, weights[sampled]))
+        cluster_score = float(cu_silhouette_score(gpu_data[sample_idx], cluster_labels[sample_idx]))
+        print(f'silhouette score for {n_clusters} clusters = {cluster_score}')
+        return cp.asnumpy(cluster_labels), cluster_score
+
 
 def main():
     if 'all' in args.scenarios:
         args.scenarios = ['default', 'night', 'overspeeding', 'distracted', 'congestion']
     if len(args.scenarios) > 1 and args.algorithm != 'boxplots':
         raise SystemExit('Multiple scenarios can only be specified for boxplots')
-    clu = DataClusterer(args.scenarios, args.logs_dir, args.data_cols)
+    clu = DataClusterer(args.scenarios, args.logs_dir, args.data_cols, use_gpu=not args.cpu)
     if args.algorithm == 'boxplots':
         clu.boxplots_summary()
         return
@@ -367,5 +774,12 @@ if __name__ == '__main__':
         help='Do KMeans++ optimal cluster detection with parallel computing. ' \
         'This speeds up the process but may cause crashes if there are resource shortages'
     )
+    parser.add_argument(
+        '--cpu',
+        action='store_true',
+        default=False,
+        help='Cluster on the CPU even if cuML and a CUDA GPU are available'
+    )
     args = parser.parse_args()
+    logging.basicConfig(format='CLUSTER-%(levelname)s: %(message)s', level=logging.INFO)
     main()
@@ -3,19 +3,60 @@ Filters our redundant data from log files
 """
 
 
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 import argparse
+import os
 
 import pandas as pd
 import numpy as np
 
-def remove_duplicates(log_file):
+# logs are read in chunks of this many rows, so memory scales with a log's unique rows rather than its size
+CHUNK_SIZE = 1_000_000
+
+def write_log(df, file_stem, as_csv=False):
+    """
+    Writes a filtered log as a zstd-compressed Feather file, or as CSV.
+
+    Parameters:
+    df (pd.DataFrame): The filtered log data.
+    file_stem (str): Path of the output file without its suffix.
+    as_csv (bool): Whether to write CSV, e.g. for external tools, instead of Feather.
+    """
+
+    if as_csv:
+        df.to_csv(f'{file_stem}.csv', index=False)
+    else:
+        df.reset_index(drop=True).to_feather(f'{file_stem}.feather', compression='zstd')
+
+def unique_chunks(f):
+    """
+    Reads a log file in chunks and yields the rows of each chunk that were not seen before.
+    Rows are compared by their 64-bit hash, for which collisions are negligible (~n^2 / 2^65 for n rows).
+    Dtypes are inferred per chunk, so numbers are hashed as float64 and other values as strings,
+    e.g. 1 read as int64 in one chunk and 1.0 read as float64 in another hash the same.
+
+    Parameters:
+    f (Path): The log file to read.
+    """
+
+    seen = np.empty(0, dtype=np.uint64)
+    for chunk in pd.read_csv(f, chunksize=CHUNK_SIZE):
+        canonical = pd.DataFrame({
+            col: values.astype(np.float64) if pd.api.types.is_numeric_dtype(values) else values.astype(str)
+            for col, values in chunk.items()
+        })
+        hashes = pd.util.hash_pandas_object(canonical, index=False).to_numpy()
+        new = ~pd.Series(hashes).duplicated().to_numpy() & ~np.isin(hashes, seen)
+        seen = np.union1d(seen, hashes[new])
+        yield chunk[new]
+
+def remove_duplicates(log_file, as_csv=False):
     """Remove duplicates from single log file"""
 
     f = Path(log_file)
-    df = pd.read_csv(f)
-    df_new = df.drop_duplicates(keep='first')
-    df_new.to_csv(f'{f.parent}/{f.stem}_filtered.csv', index=False)
+    _filter_log(f, f.parent, False, as_csv)
 
 def interpolate(df, col_name):
     """
@@ -26,26 +67,56 @@ def interpolate(df, col_name):
     col_name (str): The name of the column to be interpolated.
     """
 
-    df.loc[df[col_name] < 60, col_name] = np.nan
-    df[col_name] = df[col_name].interpolate()
-    df[col_name] = df[col_name].fillna(0)
+    # one pass over the column: values below 60 (and NaNs) are linearly interpolated between valid neighbours,
+    # trailing ones take the last valid value and leading ones are set to 0
+    values = df[col_name].to_numpy(dtype=np.float64, copy=True)
+    valid = np.flatnonzero(values >= 60)
+    if valid.size:
+        values = np.interp(np.arange(len(values)), valid, values[valid])
+        values[:valid[0]] = 0
+    else:
+        values[:] = 0
+    df[col_name] = values
+
+def _filter_log(f, output_dir, interpolate_data, as_csv):
+    """
+    Removes duplicates from a log file and writes it to the output directory.
+
+    Parameters:
+    f (Path): The log file to filter.
+    output_dir (Path): The directory to write the filtered log to.
+    interpolate_data (bool): Whether to interpolate invalid biometrics.
+    as_csv (bool): Whether to write CSV instead of Feather.
+    """
+
+    file_stem = f'{output_dir}/{f.stem}_filtered'
+    if as_csv and not interpolate_data:
+        # unique rows are streamed straight to the output, one chunk at a time
+        for i, chunk in enumerate(unique_chunks(f)):
+            chunk.to_csv(f'{file_stem}.csv', mode='a' if i else 'w', header=not i, index=False)
+        return
+
+    df_new = pd.concat(unique_chunks(f), ignore_index=True)
+    if interpolate_data:
+        try:
+            interpolate(df_new, 'heart_rate')
+            interpolate(df_new, 'breathing_rate')
+        except KeyError as e:
+            print(f'Error for log "{f}": {e.args[0]}')
+    write_log(df_new, file_stem, as_csv)
 
-def remove_duplicates_multi(logs_dir):
-    """Remove duplicates from all log files in a directory"""
+def remove_duplicates_multi(logs_dir, interpolate_data=False, as_csv=False):
+    """Remove duplicates from all log files in a directory, one process per file"""
 
     output_dir = Path(f'{logs_dir}/filtered')
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    for f in Path(logs_dir).glob('*.csv'):
-        df = pd.read_csv(f)
-        df_new = df.drop_duplicates(keep='first')
-        if args.interpolate:
-            try:
-                interpolate(df_new, 'heart_rate')
-                interpolate(df_new, 'breathing_rate')
-            except KeyError as e:
-                print(f'Error for log "{f}": {e.args[0]}')
-        df_new.to_csv(f'{output_dir}/{f.stem}_filtered.csv', index=False)
+    files = list(Path(logs_dir).glob('*.csv'))
+    if not files:
+        return
+    # every worker reads and writes its own file, so no synchronization is needed
+    with ProcessPoolExecutor(max_workers=min(len(files), os.cpu_count() or 1)) as executor:
+        list(executor.map(partial(_filter_log, output_dir=output_dir, interpolate_data=interpolate_data, as_csv=as_csv), files))
 
 
 if __name__ == '__main__':
@@ -69,11 +140,17 @@ if __name__ == '__main__':
         default=False,
         help='Interpolate invalid data (WARNING: USE ONLY IF NECESSARY)'
     )
+    parser.add_argument(
+        '--csv',
+        action='store_true',
+        default=False,
+        help='Write filtered logs as CSV instead of Feather'
+    )
     args = parser.parse_args()
 
     if args.logs_dir:
-        remove_duplicates_multi(args.logs_dir)
+        remove_duplicates_multi(args.logs_dir, args.interpolate, args.csv)
     elif args.log_file:
-        remove_duplicates(args.log_file)
+        remove_duplicates(args.log_file, args.csv)
     else:
-        remove_duplicates_multi('src/logs')
+        remove_duplicates_multi('src/logs', args.interpolate, args.csv)
@@ -12,20 +12,50 @@ Usage:
 Options:
     -d, --data    Plot specific data(s) in multiple figures
     -c, --combi   Plot specific data(s) in a single figure
-    --all         Plot all data in multiple figures
+    --all         Plot all data in a single figure with stacked axes
     --dir DIR     Folder where log files are (default: src/logs/filtered)
+    --save-dir DIR  Save figures as PNG files in this folder instead of showing them
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import cached_property, lru_cache, partial
 from pathlib import Path
 import argparse
+import os
+import re
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.feather as pafeather
+import matplotlib
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+
+from src.data._display import has_display
+
+
+# plotted log columns and their types, other columns (e.g. 'time') are not read
+LOG_DTYPES = {
+    'time_seconds': np.float32,
+    'speed': np.float32,
+    'throttle': np.float32,
+    'brake': np.float32,
+    'steer': np.float32,
+    'heart_rate': np.float32,
+    'breathing_rate': np.float32
+}
+
+# lines with more points than this are rasterized instead of being drawn as vector paths
+RASTERIZE_MIN_POINTS = 5000
 
 
 @dataclass(frozen=True)
 class LogData:
-    """Utility class for formatting text in plots.
+    """Utility class for formatting text in plots. The formatted texts are computed once per instance.
 
     Attributes:
         df_label (str): Label of the data in the DataFrame.
@@ -37,17 +67,17 @@ class LogData:
     def __repr__(self):
         return self.df_label
 
-    @property
+    @cached_property
     def legend_text(self):
         """Returns the legend text for the plot, with underscores replaced by spaces."""
         return self.df_label.replace('_', ' ')
 
-    @property
+    @cached_property
     def y_label(self):
         """Returns the y-axis label for the plot, including the unit if provided."""
         return self.legend_text + f' {f"({self.unit})" if self.unit else ""}'
 
-    @property
+    @cached_property
     def title_text(self):
         """Returns the title text for the plot, formatted in title case."""
         return self.df_label.replace("_", " ").title()
@@ -57,41 +87,186 @@ class DataPlotter:
     """Class for plotting logged driving data.
 
     Attributes:
-        df (pandas.DataFrame): DataFrame containing the logged data.
+        arrays (dict): Dictionary mapping data labels to their logged values.
         figsize (tuple): Size of the figure for the plots.
-        colors (dict): Dictionary mapping data labels to colors.
+        max_points (int): Maximum number of points drawn per line.
+        save_dir (Path): Folder figures are saved in, or None if they are shown.
+        colors (dict): Dictionary mapping data labels to RGBA colors.
     """
 
-    def __init__(self, log_file, figsize=(12, 6)):
-        """Initializes the DataPlotter with the given DataFrame and figure size.
+    def __init__(self, log_file, figsize=(12, 6), max_points=2000, save_dir=None):
+        """Initializes the DataPlotter with the given log file and figure size.
 
         Args:
-            df (pandas.DataFrame): DataFrame containing the logged data.
+            log_file (Path): Path to the CSV or Feather log file.
             figsize (tuple, optional): Size of the figure for the plots. Defaults to (12, 6).
+            max_points (int, optional): Lines with more samples are downsampled to this many points. Defaults to 2000.
+            save_dir (Path, optional): Save figures as PNG files in this folder instead of showing them.
+                Defaults to None.
         """
-        self.df = pd.read_csv(log_file)
+        self.arrays = self._load_arrays(log_file, log_file.stat().st_mtime_ns)
+        self._time = self.arrays['time_seconds']
         self.figsize = figsize
+        self.max_points = max_points
+        self.save_dir = save_dir
         self.file_name = ' '.join(log_file.stem.split('_')[2:4]).title()
-        self.colors = {
+        # colors are converted to RGBA once instead of matplotlib parsing their names on every use
+        self.colors = {label: to_rgba(color) for label, color in {
             'speed': 'blue',
             'throttle': 'green',
             'brake': 'red',
             'steer': 'brown',
             'heart_rate': 'darkorange',
             'breathing_rate': 'purple'
-        }
+        }.items()}
+
+    @staticmethod
+    @lru_cache(maxsize=16)
+    def _load_arrays(log_file, mtime_ns):
+        """Loads the plotted columns of a log as NumPy arrays, cached per file and modification time.
+
+        Plotters of an unchanged file share the same read-only arrays, so replotting a log (e.g. from
+        a notebook) does not read it again, while an edited file is read anew.
+
+        Args:
+            log_file (Path): Path to the log file.
+            mtime_ns (int): Modification time of the log file, in nanoseconds.
+
+        Returns:
+            dict: Dictionary mapping data labels to their logged values.
+        """
+        # columns are extracted once so every plot hands NumPy arrays straight to matplotlib,
+        # the DataFrame itself is not kept
+        df = DataPlotter._read_log(log_file)
+        arrays = {col: df[col].to_numpy() for col in df.columns}
+        for values in arrays.values():
+            values.flags.writeable = False
+        return arrays
+
+    @staticmethod
+    def _read_log(log_file):
+        """Reads the plotted columns of a CSV or Feather log as float32.
+
+        Args:
+            log_file (Path): Path to the log file.
+
+        Returns:
+            pandas.DataFrame: The log data.
+        """
+        if log_file.suffix == '.feather':
+            df = pd.read_feather(log_file)
+            df = df[[col for col in df.columns if col in LOG_DTYPES]]
+        else:
+            try:
+                # missing columns (e.g. logs without biometrics) are read as nulls
+                return pacsv.read_csv(
+                    log_file,
+                    convert_options=pacsv.ConvertOptions(
+                        include_columns=list(LOG_DTYPES),
+                        include_missing_columns=True,
+                        column_types={col: pa.float32() for col in LOG_DTYPES}
+                    )
+                ).to_pandas(self_destruct=True)
+            except pa.ArrowInvalid:
+                df = pd.read_csv(log_file, usecols=lambda col: col in LOG_DTYPES)
+        # logs holding invalid entries (e.g. bad biometrics) are coerced, invalid entries are not plotted
+        return df.apply(pd.to_numeric, errors='coerce').astype(np.float32)
+
+    @staticmethod
+    def _lttb(x, y, n_out):
+        """Downsamples a line with Largest-Triangle-Three-Buckets, keeping its visual shape.
+
+        The first and last points are kept, and every bucket in between keeps the point forming
+        the largest triangle with the previously kept point and the mean of the next bucket.
+
+        Args:
+            x (numpy.ndarray): x values, in increasing order.
+            y (numpy.ndarray): y values.
+            n_out (int): Number of points to keep.
+
+        Returns:
+            tuple: Downsampled x and y values.
+        """
+        n = len(x)
+        if n_out >= n or n_out < 3:
+            return x, y
+        # edges of the n_out - 2 buckets between the first and last point
+        edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+        sizes = np.diff(edges)
+        mean_x = np.append(np.add.reduceat(x[:n - 1], edges[:-1]) / sizes, x[-1])
+        mean_y = np.append(np.add.reduceat(y[:n - 1], edges[:-1]) / sizes, y[-1])
+
+        keep = np.empty(n_out, dtype=np.intp)
+        keep[0], keep[-1] = 0, n - 1
+        a = 0
+        for i in range(n_out - 2):
+            lo, hi = edges[i], edges[i + 1]
+            # twice the triangle area, the factor is irrelevant for the argmax
+            area = np.abs(
+                (x[a] - mean_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (mean_y[i + 1] - y[a])
+            )
+            a = lo + np.argmax(area)
+            keep[i + 1] = a
+        return x[keep], y[keep]
+
+    def _plot_line(self, ax, data_label, **kwargs):
+        """Plots the given data against time, downsampled to at most max_points.
+
+        Lines still longer than RASTERIZE_MIN_POINTS (i.e. when downsampling is disabled) are
+        rasterized, so vector outputs such as PDF or SVG do not store every sample.
+
+        Args:
+            ax (matplotlib.axes.Axes): Axis to plot on.
+            data_label (str): Label of the data.
+            **kwargs: Keyword arguments passed to Axes.plot.
+
+        Returns:
+            matplotlib.lines.Line2D: The plotted line.
+        """
+        time, values = self._lttb(self._time, self.arrays[data_label], self.max_points)
+        line, = ax.plot(time, values, rasterized=len(time) > RASTERIZE_MIN_POINTS, **kwargs)
+        return line
+
+    def _new_figure(self, **kwargs):
+        """Creates a figure, detached from pyplot when figures are saved instead of shown.
+
+        Detached figures are not registered with pyplot, so they are freed once saved.
 
-    def _set_plot(self, title, lines=None):
-        """Sets the title and legend for the plot.
+        Args:
+            **kwargs: Keyword arguments passed to Figure.
+
+        Returns:
+            matplotlib.figure.Figure: The new figure.
+        """
+        if self.save_dir is None:
+            return plt.figure(layout='constrained', **kwargs)
+        fig = Figure(layout='constrained', **kwargs)
+        FigureCanvasAgg(fig)
+        return fig
+
+    def _finish_figure(self, fig, label):
+        """Labels a finished figure and saves it as a PNG file if figures are not shown.
+
+        Args:
+            fig (matplotlib.figure.Figure): The finished figure.
+            label (str): Label of the figure, also used for its file name.
+        """
+        fig.set_label(label)
+        if self.save_dir is not None:
+            fig.savefig(self.save_dir / (re.sub(r'\W+', '_', label.lower()) + '.png'))
+
+    def _set_plot(self, ax, title, lines=None):
+        """Sets the title and legend for the plot and finishes its figure.
 
         Args:
+            ax (matplotlib.axes.Axes): Axis to set the title and legend on.
             title (str): Title of the plot.
             lines (list, optional): List of Line2D objects for the legend. Defaults to None.
         """
-        plt.title(title + f' ({self.file_name})')
+        ax.set_title(title + f' ({self.file_name})')
         if lines:
-            plt.legend(handles=lines)
-        plt.tight_layout()
+            ax.legend(handles=lines)
+        self._finish_figure(ax.figure, title + f' {self.file_name}')
 
     def plot(self, log_data):
         """Plots specific data against time (in seconds).
@@ -100,17 +275,17 @@ class DataPlotter:
             log_data (LogData): LogData object containing the data label and unit.
         """
         data_label = str(log_data)
-        plt.figure(figsize=self.figsize)
-        plt.plot(
-            self.df['time_seconds'], self.df[data_label],
+        ax = self._new_figure(figsize=self.figsize).add_subplot()
+        self._plot_line(
+            ax, data_label,
             label=log_data.legend_text,
             color=self.colors[data_label]
         )
-        plt.xlabel('time (s)')
-        plt.ylabel(log_data.y_label, color=self.colors[data_label])
-        plt.tick_params(axis='y', labelcolor=self.colors[data_label])
+        ax.set_xlabel('time (s)')
+        ax.set_ylabel(log_data.y_label, color=self.colors[data_label])
+        ax.tick_params(axis='y', labelcolor=self.colors[data_label])
 
-        self._set_plot(f'Time vs {log_data.title_text}')
+        self._set_plot(ax, f'Time vs {log_data.title_text}')
 
     def plot_combination(self, log_data_list):
         """Plots multiple data against time (in seconds) on a shared axis.
@@ -119,14 +294,33 @@ class DataPlotter:
             log_data_list (list of LogData): List of LogData objects to plot.
         """
         ax1, line1 = self._plot_shared_axes(log_data_list[0])
-        lines = [line1]
+        ax, lines = ax1, [line1]
         for i, ld in enumerate(log_data_list[1:]):
-            lines.append(self._plot_shared_axes(ld, ax=ax1, shift_y_mul=i)[1])
+            ax, line = self._plot_shared_axes(ld, ax=ax1, shift_y_mul=i)
+            lines.append(line)
         self._set_plot(
+            ax,
             title='Time vs ' + ', '.join([ld.title_text for ld in log_data_list]),
             lines=lines
         )
 
+    def plot_all(self, log_data_list):
+        """Plots multiple data against time (in seconds) on stacked axes sharing the time axis.
+
+        Args:
+            log_data_list (list of LogData): List of LogData objects to plot.
+        """
+        fig = self._new_figure(figsize=(self.figsize[0], self.figsize[1] * len(log_data_list) / 2))
+        axes = fig.subplots(len(log_data_list), 1, sharex=True, squeeze=False)
+        for ax, log_data in zip(axes[:, 0], log_data_list):
+            data_label = str(log_data)
+            self._plot_line(ax, data_label, color=self.colors[data_label])
+            ax.set_ylabel(log_data.y_label, color=self.colors[data_label])
+            ax.tick_params(axis='y', labelcolor=self.colors[data_label])
+        axes[-1, 0].set_xlabel('time (s)')
+        fig.suptitle(f'Time vs All Data ({self.file_name})')
+        self._finish_figure(fig, f'Time vs All Data {self.file_name}')
+
     def _plot_shared_axes(self, log_data, shift_y_mul=0, ax=None):
         """Plots data on a shared axis.
 
@@ -139,15 +333,15 @@ class DataPlotter:
             tuple: Tuple containing the axis and the Line2D object.
         """
         if ax is None:
-            _, ax = plt.subplots(figsize=self.figsize)
+            ax = self._new_figure(figsize=self.figsize).add_subplot()
             ax.set_xlabel('time (s)')
         else:
             ax = ax.twinx()
         data_label = str(log_data)
         ax.spines['right'].set_position(('outward', shift_y_mul * 45))
         ax.set_ylabel(log_data.y_label, color=self.colors[data_label])
-        line, = ax.plot(
-            self.df['time_seconds'], self.df[data_label],
+        line = self._plot_line(
+            ax, data_label,
             label=log_data.legend_text,
             color=self.colors[data_label],
         )
@@ -155,6 +349,37 @@ class DataPlotter:
         return ax, line
 
 
+def find_logs(log_dir, pattern):
+    """Finds the log files matching a pattern, converting CSV logs to Feather once.
+
+    A CSV log without a Feather copy is converted to a zstd-compressed Feather file next to it,
+    so later runs skip CSV parsing. A Feather copy older than its CSV log is regenerated.
+
+    Args:
+        log_dir (Path): Folder where log files are.
+        pattern (str): Pattern the log file names contain.
+
+    Returns:
+        list of Path: Paths of the log files to plot.
+    """
+    logs = {}
+    for log_file in sorted(log_dir.glob(f'*{pattern}*')):
+        if log_file.suffix == '.feather':
+            # a CSV log with the same stem decides which file is plotted
+            logs.setdefault(log_file.stem, log_file)
+        elif log_file.suffix == '.csv':
+            feather_file = log_file.with_suffix('.feather')
+            if not feather_file.exists() or feather_file.stat().st_mtime_ns < log_file.stat().st_mtime_ns:
+                try:
+                    pafeather.write_feather(pacsv.read_csv(log_file), feather_file, compression='zstd')
+                except OSError:
+                    # e.g. a read-only log folder, the CSV is plotted instead
+                    logs[log_file.stem] = log_file
+                    continue
+            logs[log_file.stem] = feather_file
+    return list(logs.values())
+
+
 LOG_DATA_INFO = {
     'speed': LogData('speed', 'km/h'),
     'throttle': LogData('throttle'),
@@ -170,7 +395,7 @@ if __name__ == '__main__':
     parser.add_argument(
         'log_file_pattern',
         type=str,
-        help='Plot log file(s) with this pattern (src/logs/filtered/<pattern>.csv)'
+        help='Plot log file(s) with this pattern (src/logs/filtered/<pattern>.feather or .csv)'
     )
     parser.add_argument(
         '--dir',
@@ -196,20 +421,35 @@ if __name__ == '__main__':
     group.add_argument(
         '--all',
         action='store_true',
-        help='Plot all data in multiple figures'
+        help='Plot all data in a single figure with stacked axes'
+    )
+    parser.add_argument(
+        '--save-dir',
+        type=str,
+        help='Save figures as PNG files in this folder instead of showing them'
     )
     args = parser.parse_args()
-
-
-    for log_file in Path(args.dir).glob(f'*{args.log_file_pattern}*'):
-        plotter = DataPlotter(log_file)
+    save_dir = None
+    # saved figures, or figures that cannot be shown without a display, are drawn with the off-screen Agg backend
+    if args.save_dir or not has_display():
+        matplotlib.use('Agg')
+        save_dir = Path(args.save_dir or '.')
+        save_dir.mkdir(parents=True, exist_ok=True)
+
+    log_files = find_logs(Path(args.dir), args.log_file_pattern)
+    plotters = []
+    if log_files:
+        # Arrow releases the GIL while parsing, so logs are read in parallel threads, figures are drawn in this one
+        with ThreadPoolExecutor(max_workers=min(len(log_files), os.cpu_count() or 1)) as executor:
+            plotters = list(executor.map(partial(DataPlotter, save_dir=save_dir), log_files))
+    for plotter in plotters:
         if args.all:
-            for log_data in LOG_DATA_INFO.values():
-                plotter.plot(log_data)
+            plotter.plot_all(list(LOG_DATA_INFO.values()))
         else:
             if args.data:
                 for data in args.data:
                     plotter.plot(LOG_DATA_INFO[data])
             elif args.combi:
                 plotter.plot_combination([LOG_DATA_INFO[data] for data in args.combi])
-    plt.show()
+    if save_dir is None:
+        plt.show()
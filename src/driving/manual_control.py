@@ -10,9 +10,13 @@ from configparser import ConfigParser
 import argparse
 import collections
 import datetime
+import functools
 import logging
 import math
+import queue
 import random
+import threading
+import time
 import weakref
 
 # add CARLA to sys path
@@ -34,7 +38,7 @@ except ImportError as exc:
 
 try:
     import numpy as np
-    from multiprocessing import Pipe, Process
+    from multiprocessing import get_context
     sys.path.append('App_Zephyr_main')
 except ImportError as exc:
     raise RuntimeError('Cannot import required libraries') from exc
@@ -43,11 +47,66 @@ import carla
 from carla import ColorConverter as cc
 
 from src.driving.sensors import CollisionSensor, GnssSensor, LaneInvasionSensor
-from src.driving.zephyr_stream import monitor_and_send_biometrics
+try:
+    from src.driving._lidar_nb import lidar_scatter
+    HAS_NUMBA = True
+except ImportError:
+    # without numba, LIDAR frames are projected with NumPy
+    HAS_NUMBA = False
+from src.driving.zephyr_stream import BiometricsBuffer, monitor_and_send_biometrics
 from src.scenarios.weather import WeatherManager, WEATHER_PRESETS
 
+WHEEL_CONFIG = 'src/driving/wheel_config.ini'
+# parsed wheel configs by path, with the modification time they were parsed at
+_WHEEL_CFG_CACHE = {}
+
 
 # global functions
+def yaw_heading(yaw):
+    """
+    Get the compass heading of a yaw angle.
+
+    Args:
+        yaw (float): Yaw in degrees, in [-180, 180].
+
+    Returns:
+        str: Heading such as 'N', 'SE' or 'W', empty within 0.5 degrees of the E-W axis.
+    """
+    heading = 'N' if abs(yaw) < 89.5 else ''
+    heading += 'S' if abs(yaw) > 90.5 else ''
+    heading += 'E' if 179.5 > yaw > 0.5 else ''
+    heading += 'W' if -0.5 > yaw > -179.5 else ''
+    return heading
+
+
+# headings of the half degree yaw bins from -180, the heading only changes at half degrees
+_HEADING_LUT = [yaw_heading(-180.0 + 0.5 * i + 0.25) for i in range(720)]
+
+
+def load_wheel_config(path=WHEEL_CONFIG):
+    """
+    Get the steering wheel axis and button indices, parsing the config file only when it changed.
+
+    Args:
+        path (str, optional): Path to the wheel config file. Defaults to WHEEL_CONFIG.
+
+    Returns:
+        dict: Index of the steering wheel, throttle, brake, reverse and handbrake inputs.
+    """
+    mtime = os.stat(path).st_mtime_ns
+    cached = _WHEEL_CFG_CACHE.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    parser = ConfigParser()
+    parser.read(path)
+    config = {
+        key: int(parser.get('G29 Racing Wheel', key))
+        for key in ('steering_wheel', 'throttle', 'brake', 'reverse', 'handbrake')
+    }
+    _WHEEL_CFG_CACHE[path] = (mtime, config)
+    return config
+
+
 def get_actor_display_name(actor, truncate=250):
     """
     Get a human-readable name for an actor.
@@ -59,14 +118,29 @@ def get_actor_display_name(actor, truncate=250):
     Returns:
         str: The display name of the actor.
     """
-    name = ' '.join(actor.type_id.replace('_', '.').title().split('.')[1:])
+    return _type_display_name(actor.type_id, truncate)
+
+
+@functools.lru_cache(maxsize=256)
+def _type_display_name(type_id, truncate):
+    """
+    Get a human-readable name for an actor type, cached since the HUD names the same types every tick.
+
+    Args:
+        type_id (str): Type of the actor, e.g. 'vehicle.dodge.charger_2020'.
+        truncate (int): Maximum length of the name.
+
+    Returns:
+        str: The display name of the actor type.
+    """
+    name = ' '.join(type_id.replace('_', '.').title().split('.')[1:])
     return (name[:truncate - 1] + u'\u2026') if len(name) > truncate else name
 
 
 class World:
     """Controls simulation world settings"""
 
-    def __init__(self, carla_world, hud, actor_filter):
+    def __init__(self, carla_world, hud, actor_filter, client=None):
         """
         Initialize the World class.
 
@@ -74,6 +148,7 @@ class World:
             carla_world (carla.World): The CARLA world object.
             hud (HUD): The HUD object for displaying information.
             actor_filter (str): The filter to select the actor.
+            client (carla.Client, optional): The CARLA client, used to batch vehicle light updates.
         """
         self.world = carla_world
         self.hud = hud
@@ -84,10 +159,14 @@ class World:
         self.camera_manager = None
         self._weather_man = WeatherManager(
             self.world,
-            [act for act in self.world.get_actors() if "vehicle." in act.type_id]
+            [act for act in self.world.get_actors() if "vehicle." in act.type_id],
+            client
         )
         self._weather_index = 0
         self._actor_filter = actor_filter
+        # blueprint library and map queries are blocking server calls, so their results are kept for respawns
+        self._blueprints = list(self.world.get_blueprint_library().filter(actor_filter))
+        self._spawn_points = None
         self.restart()
         self.world.on_tick(hud.on_world_tick)
 
@@ -97,7 +176,7 @@ class World:
         cam_index = self.camera_manager.index if self.camera_manager is not None else 0
         cam_pos_index = self.camera_manager.transform_index if self.camera_manager is not None else 0
         # Get a random blueprint.
-        blueprint = random.choice(self.world.get_blueprint_library().filter(self._actor_filter))
+        blueprint = random.choice(self._blueprints)
         blueprint.set_attribute('role_name', 'hero')
         if blueprint.has_attribute('color'):
             color = random.choice(blueprint.get_attribute('color').recommended_values)
@@ -111,8 +190,9 @@ class World:
             self.destroy()
             self.player = self.world.try_spawn_actor(blueprint, spawn_point)
         while self.player is None:
-            spawn_points = self.world.get_map().get_spawn_points()
-            spawn_point = random.choice(spawn_points) if spawn_points else carla.Transform()
+            if self._spawn_points is None:
+                self._spawn_points = self.world.get_map().get_spawn_points()
+            spawn_point = random.choice(self._spawn_points) if self._spawn_points else carla.Transform()
             self.player = self.world.try_spawn_actor(blueprint, spawn_point)
         # Set up the sensors.
         self.collision_sensor = CollisionSensor(self.player, self.hud, get_actor_display_name)
@@ -154,15 +234,12 @@ class World:
 
     def destroy(self):
         """Destroy all sensors and the player actor."""
-        sensors = [
-            self.camera_manager.sensor,
-            self.collision_sensor.sensor,
-            self.lane_invasion_sensor.sensor,
-            self.gnss_sensor.sensor]
-        for sensor in sensors:
-            if sensor is not None:
-                sensor.stop()
-                sensor.destroy()
+        if self.camera_manager.sensor is not None:
+            self.camera_manager.sensor.stop()
+            self.camera_manager.sensor.destroy()
+        self.collision_sensor.destroy()
+        self.lane_invasion_sensor.destroy()
+        self.gnss_sensor.destroy()
         if self.player is not None:
             self.player.destroy()
 
@@ -170,6 +247,9 @@ class World:
 class SteeringControl:
     """Parses and applies steering controls"""
 
+    PEDAL_LUT_SIZE = 1024
+    HANDLED_EVENTS = (pygame.QUIT, pygame.JOYBUTTONDOWN)
+
     def __init__(self, world, start_in_autopilot):
         """
         Initialize the SteeringControl class.
@@ -191,6 +271,10 @@ class SteeringControl:
         self._steer_cache = 0.0
         world.hud.notification("Press 'H' or '?' for help.", seconds=4.0)
 
+        # only handled events are queued, so unused input (e.g. joystick motion, mouse) does not pile up
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(self.HANDLED_EVENTS)
+
         # initialize steering wheel
         pygame.joystick.init()
 
@@ -201,16 +285,18 @@ class SteeringControl:
         self._joystick = pygame.joystick.Joystick(0)
         self._joystick.init()
 
-        self._parser = ConfigParser()
-        self._parser.read('src/driving/wheel_config.ini')
-        self._steer_idx = int(
-            self._parser.get('G29 Racing Wheel', 'steering_wheel'))
-        self._throttle_idx = int(
-            self._parser.get('G29 Racing Wheel', 'throttle'))
-        self._brake_idx = int(self._parser.get('G29 Racing Wheel', 'brake'))
-        self._reverse_idx = int(self._parser.get('G29 Racing Wheel', 'reverse'))
-        self._handbrake_idx = int(
-            self._parser.get('G29 Racing Wheel', 'handbrake'))
+        wheel_config = load_wheel_config()
+        self._steer_idx = wheel_config['steering_wheel']
+        self._throttle_idx = wheel_config['throttle']
+        self._brake_idx = wheel_config['brake']
+        self._reverse_idx = wheel_config['reverse']
+        self._handbrake_idx = wheel_config['handbrake']
+
+        # pedal curve mapping inputs [1, -1] to outputs [0, 1], tabulated at PEDAL_LUT_SIZE points
+        pedal_inputs = np.linspace(-1.0, 1.0, self.PEDAL_LUT_SIZE)
+        self._pedal_lut = np.clip(
+            1.6 + (2.05 * np.log10(-0.7 * pedal_inputs + 1.4) - 1.2) / 0.92, 0.0, 1.0
+        ).tolist()
 
     def parse_events(self, world, _):
         """
@@ -223,7 +309,7 @@ class SteeringControl:
         Returns:
             bool: True if quit event is detected, False otherwise.
         """
-        for event in pygame.event.get():
+        for event in pygame.event.get(eventtype=self.HANDLED_EVENTS):
             if event.type == pygame.QUIT:
                 return True
             elif event.type == pygame.JOYBUTTONDOWN:
@@ -248,45 +334,36 @@ class SteeringControl:
 
     def _parse_vehicle_wheel(self):
         """Parse inputs from the steering wheel and pedals."""
-        numAxes = self._joystick.get_numaxes()
-        jsInputs = [float(self._joystick.get_axis(i)) for i in range(numAxes)]
-        # print (jsInputs)
-        jsButtons = [float(self._joystick.get_button(i)) for i in
-                     range(self._joystick.get_numbuttons())]
+        # only the configured axes and buttons are read
+        steerInput = self._joystick.get_axis(self._steer_idx)
+        throttleInput = self._joystick.get_axis(self._throttle_idx)
+        brakeInput = self._joystick.get_axis(self._brake_idx)
 
         # Custom function to map range of inputs [1, -1] to outputs [0, 1]
         # For the steering, it seems fine as it is
         K1 = 1.0  # 0.55
-        steerCmd = K1 * math.tan(1.1 * jsInputs[self._steer_idx])
-
-        K2 = 1.6  # 1.6
-        throttleCmd = K2 + (2.05 * math.log10(
-            -0.7 * jsInputs[self._throttle_idx] + 1.4) - 1.2) / 0.92
-        if throttleCmd <= 0:
-            throttleCmd = 0
-        elif throttleCmd > 1:
-            throttleCmd = 1
-
-        brakeCmd = 1.6 + (2.05 * math.log10(
-            -0.7 * jsInputs[self._brake_idx] + 1.4) - 1.2) / 0.92
-        if brakeCmd <= 0:
-            brakeCmd = 0
-        elif brakeCmd > 1:
-            brakeCmd = 1
+        steerCmd = K1 * math.tan(1.1 * steerInput)
+
+        lut_scale = 0.5 * (self.PEDAL_LUT_SIZE - 1)
+        throttleCmd = self._pedal_lut[round((throttleInput + 1.0) * lut_scale)]
+        brakeCmd = self._pedal_lut[round((brakeInput + 1.0) * lut_scale)]
 
         self._control.steer = steerCmd
         self._control.brake = brakeCmd
         self._control.throttle = throttleCmd
 
-        #toggle = jsButtons[self._reverse_idx]
-
-        self._control.hand_brake = bool(jsButtons[self._handbrake_idx])
+        self._control.hand_brake = bool(self._joystick.get_button(self._handbrake_idx))
 
 
 class HUD:
     """Heads-up display for the driver vehicle."""
 
-    def __init__(self, width, height, name, zephyr_conn):
+    VEHICLES_REFRESH_FRAMES = 30
+    LOG_WRITE_INTERVAL = 0.1
+    LOG_CLOSE_TIMEOUT = 5.0
+    TEXT_CACHE_SIZE = 256
+
+    def __init__(self, width, height, name, biometrics):
         """
         Initialize the HUD.
 
@@ -294,10 +371,10 @@ class HUD:
             width (int): Width of the display.
             height (int): Height of the display.
             name (str): Unique name for log files.
-            zephyr_conn (multiprocessing.connection.Connection): Pipe for biometrics data stream.
+            biometrics (BiometricsBuffer): Shared memory holding the latest biometrics sample.
         """
         self.dim = (width, height)
-        self.zephyr_conn = zephyr_conn
+        self.biometrics = biometrics
         font = pygame.font.Font(pygame.font.get_default_font(), 20)
         font_name = 'courier' if os.name == 'nt' else 'mono'
         fonts = [x for x in pygame.font.get_fonts() if font_name in x]
@@ -305,6 +382,8 @@ class HUD:
         mono = default_font if default_font in fonts else fonts[0]
         mono = pygame.font.match_font(mono)
         self._font_mono = pygame.font.Font(mono, 12 if os.name == 'nt' else 14)
+        # most HUD lines are unchanged between frames, so their rendered surfaces are kept, least recently used first
+        self._text_cache = collections.OrderedDict()
         self._notifications = FadingText(font, (width, 40), (0, height - 40))
         self.help = HelpText(pygame.font.Font(mono, 24), width, height)
         self.server_fps = 0
@@ -313,19 +392,34 @@ class HUD:
         self._show_info = True
         self._info_text = []
         self._server_clock = pygame.time.Clock()
+        # actor queries are blocking server calls, so the vehicle list is refreshed at most every
+        # VEHICLES_REFRESH_FRAMES server frames
+        self._vehicles = []
+        self._vehicles_frame = -1
 
         # biometrics data
         self.heart_rate = 0.0
         self.breathing_rate = 0.0
+        # histories of the biometrics, scaled to the height of their HUD graphs
         self.hr_log = collections.deque([0], 200)
         self.br_log = collections.deque([0], 200)
-        self.valid_data = False
+        self.valid_data = True
+        self._hr_value = 0.0
+        self._br_value = 0.0
+        self._biometrics_seq = 0
 
         # log files
-        self.speed_log = f'src/logs/data_log_{name}_{datetime.datetime.now().strftime("%m-%d_%H%M")}.csv'
-        self.collisions_log = f'src/logs/collisions_{name}_{datetime.datetime.now().strftime("%m-%d_%H%M")}.txt'
-        with open(self.speed_log, 'w', encoding='utf-8') as f:
-            f.write('time_seconds,time,speed,throttle,brake,steer,heart_rate,breathing_rate\n')
+        start_time = datetime.datetime.now().strftime("%m-%d_%H%M")
+        self.speed_log = f'src/logs/data_log_{name}_{start_time}.csv'
+        self.collisions_log = f'src/logs/collisions_{name}_{start_time}.txt'
+        # the speed log stays open and is written through a buffer, instead of being reopened every tick
+        self._speed_f = open(self.speed_log, 'w', encoding='utf-8', buffering=1 << 16)
+        self._speed_f.write('time_seconds,time,speed,throttle,brake,steer,heart_rate,breathing_rate\n')
+        # rows are formatted and written by a writer thread, so file I/O never stalls the game loop
+        self._log_q = queue.Queue(maxsize=4096)
+        self._dropping_rows = False
+        self._log_writer = threading.Thread(target=self._write_speed_log, daemon=True)
+        self._log_writer.start()
         # with open(self.collisions_log, 'w', encoding='utf-8') as f:
         #     f.write('time_seconds,time,collision\n')
 
@@ -357,15 +451,13 @@ class HUD:
         v = world.player.get_velocity()
         c = world.player.get_control()
         speed = 3.6 * math.sqrt(v.x**2 + v.y**2 + v.z**2)
-        heading = 'N' if abs(t.rotation.yaw) < 89.5 else ''
-        heading += 'S' if abs(t.rotation.yaw) > 90.5 else ''
-        heading += 'E' if 179.5 > t.rotation.yaw > 0.5 else ''
-        heading += 'W' if -0.5 > t.rotation.yaw > -179.5 else ''
-        colhist = world.collision_sensor.get_collision_history()
-        collision = [colhist[x + self.frame - 200] for x in range(0, 200)]
-        max_col = max(1.0, max(collision))
-        collision = [x / max_col for x in collision]
-        vehicles = world.world.get_actors().filter('vehicle.*')
+        heading = _HEADING_LUT[(math.floor(2.0 * t.rotation.yaw) + 360) % 720]
+        collision = world.collision_sensor.get_collision_array(self.frame)
+        collision = (collision / max(1.0, collision.max())).tolist()
+        if not 0 <= self.frame - self._vehicles_frame <= self.VEHICLES_REFRESH_FRAMES:
+            self._vehicles = list(world.world.get_actors().filter('vehicle.*'))
+            self._vehicles_frame = self.frame
+        vehicles = self._vehicles
         self._info_text = [
             'Server:  % 16.0f FPS' % self.server_fps,
             'Client:  % 16.0f FPS' % clock.get_fps(),
@@ -400,37 +492,30 @@ class HUD:
             '',
             'Number of vehicles: % 8d' % len(vehicles)]
 
-        # receive biometrics data
-        if self.zephyr_conn.poll():
-            biometrics = self.zephyr_conn.recv()
-            self.heart_rate = biometrics[0]
-            self.breathing_rate = biometrics[1]
-
-        # check if biometrics data is valid
-        try:
-            heart_rate = float(self.heart_rate)
-            breathing_rate = float(self.breathing_rate)
-            self.valid_data = True
-        except (TypeError, ValueError):
-            logging.error('Invalid data received from Zephyr: %s', str(biometrics))
-            self.valid_data = False
+        # receive biometrics data, checked once per new sample
+        seq, heart_rate, breathing_rate = self.biometrics.read()
+        if seq != self._biometrics_seq:
+            self._biometrics_seq = seq
+            self.heart_rate = heart_rate
+            self.breathing_rate = breathing_rate
+            self.valid_data = math.isfinite(heart_rate) and math.isfinite(breathing_rate)
+            if self.valid_data:
+                self._hr_value = heart_rate
+                self._br_value = breathing_rate
+            else:
+                logging.error('Invalid data received from Zephyr: %s', str([heart_rate, breathing_rate]))
 
         if self.valid_data:
-            self.hr_log.append(heart_rate)
-            hr_plot = list(self.hr_log)
-            hr_plot = [x / 150 for x in hr_plot]
-
-            self.br_log.append(breathing_rate)
-            br_plot = list(self.br_log)
-            br_plot = [x / 35 for x in br_plot]
+            self.hr_log.append(self._hr_value / 150)
+            self.br_log.append(self._br_value / 35)
 
             self._info_text += [
                 '',
-                'Heart Rate: % 16.1f' % heart_rate,
-                hr_plot,
+                'Heart Rate: % 16.1f' % self._hr_value,
+                list(self.hr_log),
                 '',
-                'Breathing Rate: % 12.1f' % breathing_rate,
-                br_plot,
+                'Breathing Rate: % 12.1f' % self._br_value,
+                list(self.br_log),
             ]
         else:
             self._info_text += [
@@ -441,20 +526,93 @@ class HUD:
 
         if len(vehicles) > 1:
             self._info_text += ['Nearby vehicles:']
-            distance = lambda l: math.sqrt((l.x - t.location.x)**2 + (l.y - t.location.y)**2 + (l.z - t.location.z)**2)
-            vehicles = [(distance(x.get_location()), x) for x in vehicles if x.id != world.player.id]
-            for d, vehicle in sorted(vehicles):
-                if d > 200.0:
-                    break
-                vehicle_type = get_actor_display_name(vehicle, truncate=22)
-                self._info_text.append('% 4dm %s' % (d, vehicle_type))
+            vehicles = [x for x in vehicles if x.id != world.player.id]
+            locations = np.array([(l.x, l.y, l.z) for l in (x.get_location() for x in vehicles)]).reshape(-1, 3)
+            distances = np.sqrt(((locations - (t.location.x, t.location.y, t.location.z)) ** 2).sum(axis=1))
+            nearby = np.flatnonzero(distances <= 200.0)
+            for i in nearby[np.argsort(distances[nearby], kind='stable')]:
+                vehicle_type = get_actor_display_name(vehicles[i], truncate=22)
+                self._info_text.append('% 4dm %s' % (distances[i], vehicle_type))
                       
-        with open(self.speed_log, 'a', encoding='utf-8') as speed_f:
-            speed_f.write(f'{timestamp.seconds},{timestamp},{speed:.2f},{c.throttle:.2f},{c.brake:.2f},{c.steer:.2f},{self.heart_rate},{self.breathing_rate}\n')
+        # rows are never waited on, a stalled or failed writer must not freeze the game loop
+        if self._log_writer.is_alive():
+            try:
+                self._log_q.put_nowait((
+                    int(self.simulation_time), speed, c.throttle, c.brake, c.steer, self.heart_rate,
+                    self.breathing_rate
+                ))
+                self._dropping_rows = False
+            except queue.Full:
+                if not self._dropping_rows:
+                    logging.warning('Speed log writer is falling behind, dropping rows')
+                self._dropping_rows = True
 
         # with open(self.collisions_log, 'a', encoding='utf-8') as coll_f:
         #     coll_f.write(f'{timestamp.seconds},{timestamp},{collision}\n')
 
+    def _write_speed_log(self):
+        """
+        Write queued speed log rows in batches, every LOG_WRITE_INTERVAL seconds, until None is queued.
+        On a write error, e.g. a full disk, the error is logged and the thread ends, so tick() stops queueing rows.
+        """
+        try:
+            done = False
+            while not done:
+                rows = [self._log_q.get()]
+                while True:
+                    try:
+                        rows.append(self._log_q.get_nowait())
+                    except queue.Empty:
+                        break
+                if rows[-1] is None:
+                    done = True
+                    rows.pop()
+                # the time column is H:MM:SS like str(datetime.timedelta), formatted with integer math
+                self._speed_f.writelines(
+                    f'{t},{t // 3600}:{t // 60 % 60:02d}:{t % 60:02d},{speed:.2f},{throttle:.2f},{brake:.2f},'
+                    f'{steer:.2f},{hr},{br}\n'
+                    for t, speed, throttle, brake, steer, hr, br in rows
+                )
+                # flushed with every batch, so a crash loses at most one interval of rows
+                self._speed_f.flush()
+                if not done:
+                    time.sleep(self.LOG_WRITE_INTERVAL)
+        except (OSError, ValueError) as e:
+            logging.error('Speed log writing failed, no more rows are logged: %s', e)
+
+    def close(self):
+        """Write the remaining log rows, then flush and close the log files."""
+        if self._log_writer.is_alive():
+            try:
+                self._log_q.put(None, timeout=self.LOG_CLOSE_TIMEOUT)
+                self._log_writer.join(timeout=self.LOG_CLOSE_TIMEOUT)
+            except queue.Full:
+                logging.error('Speed log writer is not responding, remaining rows are lost')
+        try:
+            self._speed_f.close()
+        except OSError as e:
+            logging.error('Closing the speed log failed: %s', e)
+
+    def _render_text(self, text):
+        """
+        Render a line of HUD text, reusing the surface of recently rendered identical lines.
+
+        Args:
+            text (str): The text to render.
+
+        Returns:
+            pygame.Surface: The rendered text.
+        """
+        surface = self._text_cache.get(text)
+        if surface is None:
+            surface = self._font_mono.render(text, True, (255, 255, 255))
+            self._text_cache[text] = surface
+            if len(self._text_cache) > self.TEXT_CACHE_SIZE:
+                self._text_cache.popitem(last=False)
+        else:
+            self._text_cache.move_to_end(text)
+        return surface
+
     def toggle_info(self):
         """Toggle the display of HUD information."""
         self._show_info = not self._show_info
@@ -516,8 +674,7 @@ class HUD:
                         pygame.draw.rect(display, (255, 255, 255), rect)
                     item = item[0]
                 if item:  # At this point has to be a str.
-                    surface = self._font_mono.render(item, True, (255, 255, 255))
-                    display.blit(surface, (8, v_offset))
+                    display.blit(self._render_text(item), (8, v_offset))
                 v_offset += 18
         self._notifications.render(display)
         self.help.render(display)
@@ -662,6 +819,15 @@ class CameraManager(object):
             item.append(bp)
         self.index = None
 
+        # LIDAR frames are drawn into one reused image and surface, clearing only the previous frame's hits
+        self._lidar_scale = np.float32(min(hud.dim) / 100.0)
+        self._lidar_offset = np.array([0.5 * hud.dim[0], 0.5 * hud.dim[1]], dtype=np.float32)
+        self._lidar_max = np.array([hud.dim[0] - 1, hud.dim[1] - 1], dtype=np.int32)
+        self._lidar_img = np.zeros((hud.dim[0], hud.dim[1], 3), dtype=np.uint8)
+        self._lidar_hits = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32))
+        # double buffered, the sensor thread draws into the surface the main thread is not displaying
+        self._lidar_surfaces = (pygame.Surface(hud.dim), pygame.Surface(hud.dim))
+
     def toggle_camera(self):
         """Toggle the camera position."""
         self.transform_index = (self.transform_index + 1) % len(self._camera_transforms)
@@ -726,40 +892,51 @@ class CameraManager(object):
         if not self:
             return
         if self.sensors[self.index][0].startswith('sensor.lidar'):
-            points = np.frombuffer(image.raw_data, dtype=np.dtype('f4'))
-            points = np.reshape(points, (int(points.shape[0] / 4), 4))
-            lidar_data = np.array(points[:, :2])
-            lidar_data *= min(self.hud.dim) / 100.0
-            lidar_data += (0.5 * self.hud.dim[0], 0.5 * self.hud.dim[1])
-            lidar_data = np.fabs(lidar_data) # pylint: disable=E1111
-            lidar_data = lidar_data.astype(np.int32)
-            lidar_data = np.reshape(lidar_data, (-1, 2))
-            lidar_img_size = (self.hud.dim[0], self.hud.dim[1], 3)
-            lidar_img = np.zeros(lidar_img_size)
-            lidar_img[tuple(lidar_data.T)] = (255, 255, 255)
-            self.surface = pygame.surfarray.make_surface(lidar_img)
+            points = np.frombuffer(image.raw_data, dtype=np.dtype('f4')).reshape(-1, 4)
+            if HAS_NUMBA:
+                self._lidar_hits = lidar_scatter(
+                    points, self._lidar_img, self._lidar_scale, self._lidar_offset[0], self._lidar_offset[1],
+                    *self._lidar_hits
+                )
+            else:
+                lidar_data = np.abs(points[:, :2] * self._lidar_scale + self._lidar_offset).astype(np.int32)
+                # points at the very edge of the range would land one pixel outside the image
+                np.clip(lidar_data, 0, self._lidar_max, out=lidar_data)
+                self._lidar_img[self._lidar_hits] = 0
+                self._lidar_hits = (lidar_data[:, 0], lidar_data[:, 1])
+                self._lidar_img[self._lidar_hits] = 255
+            surface = self._lidar_surfaces[self.surface is self._lidar_surfaces[0]]
+            pygame.surfarray.blit_array(surface, self._lidar_img)
+            self.surface = surface
         else:
             image.convert(self.sensors[self.index][1])
-            array = np.frombuffer(image.raw_data, dtype=np.dtype("uint8"))
-            array = np.reshape(array, (image.height, image.width, 4))
-            array = array[:, :, :3]
-            array = array[:, :, ::-1]
-            self.surface = pygame.surfarray.make_surface(array.swapaxes(0, 1))
+            try:
+                # CARLA images are BGRA rows, which pygame reads as they are, then copied once into the
+                # display's pixel format, without per-pixel alpha, so blitting the frame is a plain copy
+                self.surface = pygame.image.frombuffer(image.raw_data, (image.width, image.height), 'BGRA').convert()
+            except ValueError:
+                # pygame < 2.1.3 has no 'BGRA' format
+                array = np.frombuffer(image.raw_data, dtype=np.dtype("uint8"))
+                array = np.reshape(array, (image.height, image.width, 4))
+                array = array[:, :, :3]
+                array = array[:, :, ::-1]
+                self.surface = pygame.surfarray.make_surface(array.swapaxes(0, 1))
         if self.recording:
             image.save_to_disk('_out/%08d' % image.frame)
 
 
-def game_loop(args, parent_conn, child_conn):
+def game_loop(args, biometrics):
     """
     Main game loop.
 
     Args:
         args (argparse.Namespace): Parsed command-line arguments.
-        parent_conn (multiprocessing.connection.Connection): Parent connection for biometrics data.
-        child_conn (multiprocessing.connection.Connection): Child connection for biometrics data.
+        biometrics (BiometricsBuffer): Shared memory holding the latest biometrics sample.
     """
     pygame.init()
     pygame.font.init()
+    hud = None
+    world = None
 
     try:
         client = carla.Client('127.0.0.1', 2000)
@@ -769,27 +946,36 @@ def game_loop(args, parent_conn, child_conn):
             (args.width, args.height),
             pygame.HWSURFACE | pygame.DOUBLEBUF)
 
-        hud = HUD(args.width, args.height, args.name, parent_conn)
-        world = World(client.get_world(), hud, args.vehicle)
+        hud = HUD(args.width, args.height, args.name, biometrics)
+        world = World(client.get_world(), hud, args.vehicle, client)
         controller = SteeringControl(world, args.autopilot)
 
         clock = pygame.time.Clock()
+        # bound once, the instances live for the whole session
+        tick_clock = clock.tick
+        parse_events = controller.parse_events
+        tick_world = world.tick
+        render_world = world.render
+        flip_display = pygame.display.flip
         while True:
-            clock.tick_busy_loop(60)
-            if controller.parse_events(world, clock):
+            tick_clock(60)
+            if parse_events(world, clock):
                 return
-            world.tick(clock)
-            world.render(display)
-            pygame.display.flip()
+            tick_world(clock)
+            render_world(display)
+            flip_display()
 
     finally:
-        parent_conn.send(True)
-        child_conn.close()
-        parent_conn.close()
-        if world is not None:
-            world.destroy()
-
-        pygame.quit()
+        # the log is closed first, so its rows are written even if destroying the actors fails
+        try:
+            if hud is not None:
+                hud.close()
+        finally:
+            try:
+                if world is not None:
+                    world.destroy()
+            finally:
+                pygame.quit()
 
 
 def main():
@@ -797,8 +983,12 @@ def main():
     if os.path.exists(args.name):
         if input('This will overwrite an existing log file. Proceed? [Y/n]: ') not in ('Y', 'y'):
             return
-    parent_conn, child_conn = Pipe()
-    p = Process(target=monitor_and_send_biometrics, args=(child_conn,))
+    # forking skips re-importing CARLA and pygame in the Zephyr process, other platforms keep their default
+    mp_context = get_context('fork' if sys.platform.startswith('linux') else None)
+    parent_conn, child_conn = mp_context.Pipe()
+    biometrics = BiometricsBuffer()
+    stop_event = mp_context.Event()
+    p = mp_context.Process(target=monitor_and_send_biometrics, args=(child_conn, biometrics.name, stop_event))
     try:
         p.start()
         logging.info(str(parent_conn.recv()))
@@ -808,11 +998,15 @@ def main():
         logging.info('Cancelled by user. Bye!')
     else:
         try:
-            game_loop(args, parent_conn, child_conn)
+            game_loop(args, biometrics)
         except KeyboardInterrupt:
             logging.info('Cancelled by user. Bye!')
     finally:
+        stop_event.set()
         p.join()
+        child_conn.close()
+        parent_conn.close()
+        biometrics.close(unlink=True)
         logging.info('Zephyr stream terminated.')
 
 
@@ -7,7 +7,9 @@ import glob
 import math
 import os
 import sys
-import weakref
+import time
+
+import numpy as np
 
 try:
     # Dynamically append the path of the CARLA egg file to the system path
@@ -21,9 +23,28 @@ except IndexError:
 import carla
 
 
+def _destroy_sensor(sensor):
+    """
+    Stop a sensor's listener, releasing the callback and what it references, then destroy the sensor actor.
+
+    Args:
+        sensor (carla.Sensor): The sensor to destroy, may be None.
+    """
+    if sensor is not None:
+        sensor.stop()
+        sensor.destroy()
+
+
 class CollisionSensor:
     """Collision sensor for the vehicle."""
 
+    # number of recent frames whose collision intensities are kept in a ring buffer for the HUD
+    COLLISION_WINDOW = 200
+    # number of most recent collision events kept for get_collision_history
+    HISTORY_SIZE = 4000
+    # seconds during which repeated collisions with the same actor type don't renotify the HUD
+    NOTIFY_INTERVAL = 0.5
+
     def __init__(self, parent_actor, hud, actor_name_func):
         """
         Initialize the CollisionSensor class.
@@ -33,17 +54,28 @@ class CollisionSensor:
             hud (HUD): The HUD object for displaying information.
         """
         self.sensor = None
-        self.history = []
+        # circular buffers of the most recent collision events, the next one is written at _history_pos
+        self._history_frames = np.zeros(self.HISTORY_SIZE, dtype=np.int64)
+        self._history_intensities = np.zeros(self.HISTORY_SIZE, dtype=np.float32)
+        self._history_pos = 0
+        self._history_count = 0
         self._parent = parent_actor
         self.hud = hud
         self._actor_name_func = actor_name_func
+        # notification text per actor type id, and the last one shown with when it was shown
+        self._messages = {}
+        self._last_message = None
+        self._last_notified = 0.0
+        # slot frame % (COLLISION_WINDOW + 1) holds the summed intensity of the last frame stored in it,
+        # the extra slot keeps the current frame from overwriting the oldest one of the window
+        self._frames = np.full(self.COLLISION_WINDOW + 1, -1, dtype=np.int64)
+        self._intensities = np.zeros(self.COLLISION_WINDOW + 1)
+        self._window = np.arange(-self.COLLISION_WINDOW, 0)
         world = self._parent.get_world()
         bp = world.get_blueprint_library().find('sensor.other.collision')
         self.sensor = world.spawn_actor(bp, carla.Transform(), attach_to=self._parent)
-        # We need to pass the lambda a weak reference to self to avoid circular
-        # reference.
-        weak_self = weakref.ref(self)
-        self.sensor.listen(lambda event: CollisionSensor._on_collision(weak_self, event, actor_name_func))
+        # the listener holds a reference to self until destroy() stops the sensor
+        self.sensor.listen(self._on_collision)
 
     def get_collision_history(self):
         """
@@ -52,35 +84,68 @@ class CollisionSensor:
         Returns:
             dict: A dictionary with the frame number as the key and collision intensity as the value.
         """
-        history = collections.defaultdict(int)
-        for frame, intensity in self.history:
-            history[frame] += intensity
-        return history
+        frames = self._history_frames[:self._history_count]
+        intensities = self._history_intensities[:self._history_count]
+        unique_frames, inverse = np.unique(frames, return_inverse=True)
+        totals = np.bincount(inverse, weights=intensities, minlength=len(unique_frames))
+        return collections.defaultdict(int, zip(unique_frames.tolist(), totals.tolist()))
+
+    def get_collision_array(self, frame):
+        """
+        Get the collision intensities of the COLLISION_WINDOW frames before a frame.
+
+        Args:
+            frame (int): The current frame number.
+
+        Returns:
+            numpy.ndarray: Summed collision intensity of each frame, oldest first.
+        """
+        frames = self._window + frame
+        slots = frames % len(self._frames)
+        return np.where(self._frames[slots] == frames, self._intensities[slots], 0.0)
 
-    @staticmethod
-    def _on_collision(weak_self, event, actor_name_func):
+    def destroy(self):
+        """Stop listening and destroy the sensor actor."""
+        _destroy_sensor(self.sensor)
+        self.sensor = None
+        self._parent = None
+
+    def _on_collision(self, event):
         """
         Handle collision events.
 
         Args:
-            weak_self (weakref.ref): Weak reference to the CollisionSensor instance.
             event (carla.CollisionEvent): The collision event.
         """
-        self = weak_self()
-        if not self:
-            return
-        actor_type = actor_name_func(event.other_actor)
-        self.hud.notification('Collision with %r' % actor_type)
+        type_id = event.other_actor.type_id
+        message = self._messages.get(type_id)
+        if message is None:
+            message = self._messages[type_id] = 'Collision with %r' % self._actor_name_func(event.other_actor)
+        # sustained contact fires an event every frame, only renotify once the previous notification is stale
+        now = time.monotonic()
+        if message != self._last_message or now - self._last_notified >= self.NOTIFY_INTERVAL:
+            self.hud.notification(message)
+            self._last_message = message
+            self._last_notified = now
         impulse = event.normal_impulse
-        intensity = math.sqrt(impulse.x**2 + impulse.y**2 + impulse.z**2)
-        self.history.append((event.frame, intensity))
-        if len(self.history) > 4000:
-            self.history.pop(0)
+        intensity = math.hypot(impulse.x, impulse.y, impulse.z)
+        self._history_frames[self._history_pos] = event.frame
+        self._history_intensities[self._history_pos] = intensity
+        self._history_pos = (self._history_pos + 1) % self.HISTORY_SIZE
+        self._history_count = min(self._history_count + 1, self.HISTORY_SIZE)
+        slot = event.frame % len(self._frames)
+        if self._frames[slot] != event.frame:
+            self._intensities[slot] = 0.0
+            self._frames[slot] = event.frame
+        self._intensities[slot] += intensity
 
 
 class LaneInvasionSensor:
     """Lane invasion sensor for the vehicle."""
 
+    # quoted display name of each carla.LaneMarkingType seen so far
+    _LANE_NAMES = {}
+
     def __init__(self, parent_actor, hud):
         self.sensor = None
         self._parent = parent_actor
@@ -88,26 +153,29 @@ class LaneInvasionSensor:
         world = self._parent.get_world()
         bp = world.get_blueprint_library().find('sensor.other.lane_invasion')
         self.sensor = world.spawn_actor(bp, carla.Transform(), attach_to=self._parent)
-        # We need to pass the lambda a weak reference to self to avoid circular
-        # reference.
-        weak_self = weakref.ref(self)
-        self.sensor.listen(lambda event: LaneInvasionSensor._on_invasion(weak_self, event))
+        # the listener holds a reference to self until destroy() stops the sensor
+        self.sensor.listen(self._on_invasion)
 
-    @staticmethod
-    def _on_invasion(weak_self, event):
+    def destroy(self):
+        """Stop listening and destroy the sensor actor."""
+        _destroy_sensor(self.sensor)
+        self.sensor = None
+        self._parent = None
+
+    def _on_invasion(self, event):
         """
         Handle lane invasion events.
 
         Args:
-            weak_self (weakref.ref): Weak reference to the LaneInvasionSensor instance.
             event (carla.LaneInvasionEvent): The lane invasion event.
         """
-
-        self = weak_self()
-        if not self:
-            return
-        lane_types = set(x.type for x in event.crossed_lane_markings)
-        text = ['%r' % str(x).split()[-1] for x in lane_types]
+        lane_names = self._LANE_NAMES
+        text = []
+        for lane_type in {x.type for x in event.crossed_lane_markings}:
+            name = lane_names.get(lane_type)
+            if name is None:
+                name = lane_names[lane_type] = '%r' % str(lane_type).split()[-1]
+            text.append(name)
         self.hud.notification('Crossed line %s' % ' and '.join(text))
 
 
@@ -128,22 +196,21 @@ class GnssSensor:
         world = self._parent.get_world()
         bp = world.get_blueprint_library().find('sensor.other.gnss')
         self.sensor = world.spawn_actor(bp, carla.Transform(carla.Location(x=1.0, z=2.8)), attach_to=self._parent)
-        # We need to pass the lambda a weak reference to self to avoid circular
-        # reference.
-        weak_self = weakref.ref(self)
-        self.sensor.listen(lambda event: GnssSensor._on_gnss_event(weak_self, event))
+        # the listener holds a reference to self until destroy() stops the sensor
+        self.sensor.listen(self._on_gnss_event)
+
+    def destroy(self):
+        """Stop listening and destroy the sensor actor."""
+        _destroy_sensor(self.sensor)
+        self.sensor = None
+        self._parent = None
 
-    @staticmethod
-    def _on_gnss_event(weak_self, event):
+    def _on_gnss_event(self, event):
         """
         Handle GNSS events.
 
         Args:
-            weak_self (weakref.ref): Weak reference to the GnssSensor instance.
             event (carla.GnssEvent): The GNSS event.
         """
-        self = weak_self()
-        if not self:
-            return
         self.lat = event.latitude
         self.lon = event.longitude
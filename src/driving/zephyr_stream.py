@@ -3,7 +3,11 @@ Provides a Zephyr biometrics data stream, transmitting data via OSC.
 """
 
 import logging
-from multiprocessing import Pipe, Process
+import math
+from multiprocessing import Event, Pipe, Process
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
 
 # Bioharness
 from pylsl import StreamInlet, resolve_streams
@@ -18,33 +22,116 @@ from osc4py3.as_eventloop import (
 )
 
 
+# seconds to wait for an LSL sample between two OSC dispatches
+OSC_POLL_INTERVAL = 0.01
+
+
+class BiometricsBuffer:
+    """
+    Latest biometrics sample in shared memory, written by the Zephyr process and read by the CARLA client
+    without pickling or a syscall per read.
+
+    A sequence counter guards the sample: it is odd while a sample is being written, so readers retry until
+    the counter is even and unchanged around their copy.
+
+    Attributes:
+        name (str): Name of the shared memory block, to attach to it from another process.
+    """
+
+    SIZE = 24
+    # a writer killed mid-write leaves the sequence odd for good, so reads give up after this many tries
+    MAX_READ_SPINS = 500
+
+    def __init__(self, name=None):
+        """
+        Creates the shared memory block, or attaches to an existing one.
+
+        Args:
+            name (str, optional): Name of the block to attach to. Defaults to None, creating a new block.
+        """
+        self._shm = SharedMemory(name=name, create=name is None, size=self.SIZE)
+        self.name = self._shm.name
+        self._seq = np.ndarray((1,), dtype=np.uint64, buffer=self._shm.buf)
+        self._sample = np.ndarray((2,), dtype=np.float64, buffer=self._shm.buf, offset=8)
+        self._last_read = (0, math.nan, math.nan)
+
+    def write(self, hr, br):
+        """
+        Publishes a biometrics sample.
+
+        Args:
+            hr (float): Heart rate.
+            br (float): Breathing rate.
+        """
+        self._seq[0] += 1
+        self._sample[0] = hr
+        self._sample[1] = br
+        self._seq[0] += 1
+
+    def read(self):
+        """
+        Reads the latest biometrics sample.
+
+        Returns:
+            tuple: Number of samples written so far, heart rate and breathing rate.
+                The last sample read (NaNs before the first) if no consistent sample could be read.
+        """
+        for _ in range(self.MAX_READ_SPINS):
+            seq = int(self._seq[0])
+            if seq % 2:
+                continue
+            hr, br = self._sample.tolist()
+            if int(self._seq[0]) == seq:
+                self._last_read = (seq // 2, hr, br)
+                break
+        return self._last_read
+
+    def close(self, unlink=False):
+        """
+        Detaches from the shared memory block.
+
+        Args:
+            unlink (bool, optional): Whether to also free the block, done by its creator. Defaults to False.
+        """
+        # views into the block must be released before it can be closed
+        self._seq = self._sample = None
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+
 class ZephyrStream:
     """
-    Handles the Zephyr biometrics data stream and sends biometrics data via a pipe.
+    Handles the Zephyr biometrics data stream and publishes biometrics data to shared memory.
 
     Attributes:
-        child_conn (Connection): Multiprocessing connection for communication.
+        child_conn (Connection): Multiprocessing connection for the start signal.
         ip (str): IP address for OSC client and server.
         port (int): Port number for OSC client and server.
+        use_osc (bool): Whether the OSC client and server are running.
         gen_inlet (StreamInlet): Inlet for the resolved Zephyr stream.
     """
 
-    def __init__(self, child_conn, ip='127.0.0.1', port=8000):
+    def __init__(self, child_conn, ip='127.0.0.1', port=8000, use_osc=False):
         """
         Initializes the ZephyrStream with OSC setup and resolves the biometrics stream.
 
         Args:
-            child_conn (Connection): Multiprocessing connection for communication.
+            child_conn (Connection): Multiprocessing connection for the start signal.
             ip (str, optional): IP address for OSC client and server. Defaults to '127.0.0.1'.
             port (int, optional): Port number for OSC client and server. Defaults to 8000.
+            use_osc (bool, optional): Whether to start the OSC client and server. Defaults to False, as no OSC
+                handlers are registered.
         """
         self.child_conn = child_conn
         self.ip = ip
         self.port = port
+        self.use_osc = use_osc
 
-        osc_startup()
-        osc_udp_client(self.ip, self.port, 'udplisten')
-        osc_udp_server(self.ip, self.port, 'udpclient')
+        if self.use_osc:
+            osc_startup()
+            osc_udp_client(self.ip, self.port, 'udplisten')
+            osc_udp_server(self.ip, self.port, 'udpclient')
 
         # Resolve streams
         self.gen_inlet = self.resolve_streams()
@@ -70,17 +157,24 @@ class ZephyrStream:
 
         return gen_inlet
 
-    def get_biometrics(self, gen_inlet):
+    def get_biometrics(self, gen_inlet, timeout=1.0):
         """
-        Extracts biometrics data from the Zephyr stream.
+        Extracts the newest biometrics data from the Zephyr stream.
 
         Args:
             gen_inlet (StreamInlet): Inlet for the resolved Zephyr stream.
+            timeout (float, optional): Seconds to wait for a sample. Defaults to 1.0.
 
         Returns:
-            list: Heart rate and breathing rate from the biometrics data.
+            list: Heart rate and breathing rate from the biometrics data, or None if no sample arrived in time.
         """
-        gen_sample, _ = gen_inlet.pull_sample()
+        gen_sample, _ = gen_inlet.pull_sample(timeout=timeout)
+        if gen_sample is None:
+            return None
+        # drain samples that queued up meanwhile in one call, only the newest is published
+        backlog, _ = gen_inlet.pull_chunk()
+        if backlog:
+            gen_sample = backlog[-1]
         hr = gen_sample[2]
         br = gen_sample[3]
         # print(f'gen_sample = {gen_sample}')
@@ -107,48 +201,66 @@ class ZephyrStream:
         return [hr, br]
 
 
-def monitor_and_send_biometrics(child_conn, debug=False):
+def monitor_and_send_biometrics(child_conn, biometrics_name, stop_event, debug=False):
     """
     Monitors the Zephyr biometrics stream and sends data via OSC.
 
     Args:
-        child_conn (Connection): Multiprocessing connection for communication.
+        child_conn (Connection): Multiprocessing connection for the start signal.
+        biometrics_name (str): Name of the BiometricsBuffer to publish samples to.
+        stop_event (Event): Set by the parent process to stop monitoring.
         debug (bool, optional): Flag to enable debug logging. Defaults to False.
     """
     logging.basicConfig(
         format='ZEPHYR-%(levelname)s: %(message)s',
         level=logging.DEBUG if debug else logging.INFO
     )
+    biometrics = BiometricsBuffer(biometrics_name)
     zephyr_stream = ZephyrStream(child_conn)
-    while True:
-        if zephyr_stream.child_conn.poll():
-            zephyr_stream.child_conn.close()
-            break
+    # with OSC running, wait on LSL only briefly so incoming OSC messages are dispatched between samples
+    timeout = OSC_POLL_INTERVAL if zephyr_stream.use_osc else 1.0
+    while not stop_event.is_set():
+        live = zephyr_stream.get_biometrics(zephyr_stream.gen_inlet, timeout)
+        if zephyr_stream.use_osc:
+            osc_process()
+        if live is None:
+            continue
 
-        live = zephyr_stream.get_biometrics(zephyr_stream.gen_inlet)
-        osc_process()
-
-        hr = str(live[0])
-        br = str(live[1])
+        try:
+            hr = float(live[0])
+            br = float(live[1])
+        except (TypeError, ValueError):
+            # NaN marks the sample as invalid for the HUD
+            logging.error('Invalid data received from Zephyr: %s', str(live))
+            hr = br = math.nan
 
         # send data to CARLA
-        data = [hr, br]
         logging.debug('HR: %s, BR: %s', hr, br)
-        zephyr_stream.child_conn.send(data)
+        biometrics.write(hr, br)
 
-    osc_terminate()
+    zephyr_stream.child_conn.close()
+    biometrics.close()
+    if zephyr_stream.use_osc:
+        osc_terminate()
 
 
 if __name__ == '__main__':
     logging.basicConfig(format='ZEPHYR-%(levelname)s: %(message)s', level=logging.DEBUG)
     parent_conn, child_conn = Pipe()
-    p = Process(target=monitor_and_send_biometrics, args=(child_conn, True))
+    biometrics = BiometricsBuffer()
+    stop_event = Event()
+    p = Process(target=monitor_and_send_biometrics, args=(child_conn, biometrics.name, stop_event, True))
     try:
         p.start()
         logging.info(str(parent_conn.recv()))
+        # keep streaming until cancelled
+        p.join()
     except (AttributeError, TypeError, ValueError) as e:
         logging.error('Error initializing Zephyr stream: %s', e.args[0])
+        stop_event.set()
     except KeyboardInterrupt:
         logging.info('Cancelled by user. Bye!')
+        stop_event.set()
     finally:
         p.join()
+        biometrics.close(unlink=True)
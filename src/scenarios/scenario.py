@@ -48,6 +48,7 @@ def set_global_settings(world, traffic_manager):
 def main():
 
     scenario = Scenario[args.scenario]
+    congestion = scenario == Scenario.congestion or args.congestion
     client = carla.Client(args.host, args.port)
     client.set_timeout(10.0)
     random.seed(args.seed if args.seed is not None else int(time.time()))
@@ -65,7 +66,7 @@ def main():
         # initialize vehicles and pedestrians
         traffic_gen = TrafficGenerator(client, world, traffic_manager, args)
         traffic_gen.set_global_tm_settings(en_auto_lane_change=scenario == Scenario.default)
-        if scenario != Scenario.congestion and not args.congestion:
+        if not congestion:
             traffic_gen.spawn_vehicles()
             if args.aggression:
                 traffic_gen.set_aggressive_behavior_all(
@@ -94,11 +95,11 @@ def main():
         logging.info(
             'Spawned %d vehicles and %d walkers, press Ctrl+C to exit.',
             len(traffic_gen.vehicles_list),
-            len(traffic_gen.walkers_list)
+            len(traffic_gen.walker_ids)
         )
 
         # initialize weather
-        weather_man = WeatherManager(world, world.get_actors(traffic_gen.vehicles_list))
+        weather_man = WeatherManager(world, traffic_gen.vehicle_actors, client)
         if scenario == Scenario.night:
             weather_man.set_weather(WeatherType.CLEAR)
             weather_man.set_time_of_day(TimeOfDay.NIGHT)
@@ -108,16 +109,32 @@ def main():
         weather_man.apply_settings()
 
         vehicles_list = traffic_gen.vehicles_list
-        walkers_list = traffic_gen.walkers_list
+        walkers_list = traffic_gen.walker_ids
         combined_walker_ids = traffic_gen.combined_walker_ids
         combined_walker_actors = traffic_gen.combined_walker_actors
 
+        # tick no faster than the fixed time step, sleeping off the rest of each step instead of asking
+        # the server for frames ahead of real time
+        tick_period = world.get_settings().fixed_delta_seconds or 0.0
+        # bound once, the loop calls them every frame for the whole session
+        tick = world.tick
+        spawn_congestion_vehicle = traffic_gen.spawn_congestion_vehicle
+        set_car_lights = weather_man.set_car_lights
+        perf_counter = time.perf_counter
+        sleep = time.sleep
+        next_tick = perf_counter()
         while True:
-            world.tick()
-            if scenario == Scenario.congestion or args.congestion:
-                vehicle = traffic_gen.spawn_congestion_vehicle()
+            frame = tick()
+            if congestion:
+                vehicle = spawn_congestion_vehicle(frame)
                 if vehicle:
-                    weather_man.set_car_lights(vehicle)
+                    set_car_lights(vehicle)
+            next_tick += tick_period
+            delay = next_tick - perf_counter()
+            if delay > 0:
+                sleep(delay)
+            else:
+                next_tick = perf_counter()
 
     finally:
         settings = world.get_settings()
@@ -126,15 +143,13 @@ def main():
         settings.fixed_delta_seconds = None
         world.apply_settings(settings)
 
-        logging.info('Destroying %d vehicles', len(vehicles_list))
-        client.apply_batch([carla.command.DestroyActor(x) for x in vehicles_list])
-
         # stop walker controllers (list is [controller, actor, controller, actor ...])
         for i in range(0, len(combined_walker_ids), 2):
             combined_walker_actors[i].stop()
 
-        logging.info('Destroying %d walkers', len(walkers_list))
-        client.apply_batch([carla.command.DestroyActor(x) for x in combined_walker_ids])
+        # destroy vehicles, walkers and walker controllers in a single batch
+        logging.info('Destroying %d vehicles and %d walkers', len(vehicles_list), len(walkers_list))
+        client.apply_batch(list(map(carla.command.DestroyActor, vehicles_list + combined_walker_ids)))
 
         time.sleep(0.5)
 
@@ -33,12 +33,16 @@ class TrafficGenerator:
         self.world = world
         self.traffic_manager = traffic_manager
         self.args = args
+        # the blueprint library is fetched from the server, so it is kept for every lookup
+        self._bp_lib = self.world.get_blueprint_library()
         self.vehicle_blueprints = self.get_actor_blueprints(self.args.filterv, self.args.generationv)
         if not self.vehicle_blueprints:
             raise ValueError('Couldn\'t find any vehicles with the specified filters')
+        self.vehicle_blueprints = sorted(self.vehicle_blueprints, key=lambda bp: bp.id)
         self.walker_blueprints = self.get_actor_blueprints(self.args.filterw, self.args.generationw)
         if not self.walker_blueprints:
             raise ValueError('Couldn\'t find any walkers with the specified filters')
+        self.walker_controller_bp = self._bp_lib.find('controller.ai.walker')
 
         self.n_vehicles = self.args.number_of_vehicles
         self.n_walkers = self.args.number_of_walkers
@@ -48,20 +52,33 @@ class TrafficGenerator:
         # Congestion variables
         self.route_1_indices = [129, 28, 124, 33, 97, 119, 58, 154, 147]
         self.route_2_indices = [21, 76, 38, 34, 90, 3]
+        if len(self.spawn_points) <= max(self.route_1_indices):
+            raise ValueError('The congestion routes need a map with more than %d spawn points, found %d'
+                             % (max(self.route_1_indices), len(self.spawn_points)))
         self.route_1 = [self.spawn_points[i].location for i in self.route_1_indices]
         self.route_2 = [self.spawn_points[i].location for i in self.route_2_indices]
+        # where vehicles following each route spawn, resolved before spawn_vehicles can shuffle the spawn points
+        self.route_1_spawn = self.spawn_points[32]
+        self.route_2_spawn = self.spawn_points[149]
         self.alt = False
         self.spawn_delay = 20
-        self.counter = self.spawn_delay
+        # first frame at which another congestion vehicle may spawn, set on the first call
+        self.next_spawn_frame = None
 
         self.vehicles_list = []
-
-        self.walkers_list = []
+        # actors of vehicles_list, fetched once after spawning instead of on every fleet-wide update
+        self.vehicle_actors = []
+        # log description of each vehicle, by actor id
+        self._vehicle_descs = {}
+
+        # ids of the spawned walkers and of their controllers, in the same order
+        self.walker_ids = []
+        self.controller_ids = []
         self.combined_walker_ids = []
         self.combined_walker_actors = []
 
     def get_actor_blueprints(self, filter, generation):
-        bps = self.world.get_blueprint_library().filter(filter)
+        bps = self._bp_lib.filter(filter)
 
         if generation.lower() == "all":
             return bps
@@ -89,14 +106,17 @@ class TrafficGenerator:
         if self.args.seed is not None:
             self.traffic_manager.set_random_device_seed(self.args.seed)
         if en_auto_lane_change:
-            for vehicle_actor in self.world.get_actors(self.vehicles_list):
+            for vehicle_actor in self.vehicle_actors:
                 self.traffic_manager.auto_lane_change(vehicle_actor, False)
                 logging.info('Auto lane change turned off for vehicle "%s"', self.get_vehicle_desc(vehicle_actor))
 
-    def spawn_congestion_vehicle(self):
-        n_congestion_vehicles = len(self.world.get_actors().filter('*vehicle*'))
-        if self.counter == 0 and n_congestion_vehicles < 200:
-            spawn_point = self.spawn_points[32] if self.alt else self.spawn_points[149]
+    def spawn_congestion_vehicle(self, frame):
+        if self.next_spawn_frame is None:
+            self.next_spawn_frame = frame + self.spawn_delay
+        # every vehicle of a congestion scenario is spawned here, so the list length is the count
+        n_congestion_vehicles = len(self.vehicles_list)
+        if frame >= self.next_spawn_frame and n_congestion_vehicles < 200:
+            spawn_point = self.route_1_spawn if self.alt else self.route_2_spawn
             vehicle = self.world.try_spawn_actor(random.choice(self.vehicle_blueprints), spawn_point)
             if vehicle:
                 vehicle.set_autopilot(True)
@@ -109,11 +129,11 @@ class TrafficGenerator:
                 self.traffic_manager.set_path(vehicle, path)
                 self.alt = not self.alt
                 self.vehicles_list.append(vehicle.id)
+                self.vehicle_actors.append(vehicle)
                 logging.info('Spawned congestion vehicle (current: %d vehicles)', n_congestion_vehicles)
                 return vehicle
-            self.counter = self.spawn_delay
-        else:
-            self.counter -= 1 if self.counter > 0 else 0
+            # the spawn point is blocked, give the last vehicle time to clear it
+            self.next_spawn_frame = frame + self.spawn_delay + 1
         return None
 
     def spawn_vehicles(self):
@@ -121,7 +141,6 @@ class TrafficGenerator:
             # spawns only cars cus apparently those are less prone to accidents
             self.vehicle_blueprints = [x for x in self.vehicle_blueprints if x.get_attribute('base_type') == 'car']
 
-        self.vehicle_blueprints = sorted(self.vehicle_blueprints, key=lambda bp: bp.id)
         n_spawn_points = len(self.spawn_points)
         if self.n_vehicles < n_spawn_points:
             random.shuffle(self.spawn_points)
@@ -132,16 +151,24 @@ class TrafficGenerator:
 
         batch = []
         hero = self.args.hero
-        for n, transform in enumerate(self.spawn_points):
-            if n >= self.args.number_of_vehicles:
-                break
-            blueprint = random.choice(self.vehicle_blueprints)
-            if blueprint.has_attribute('color'):
-                color = random.choice(blueprint.get_attribute('color').recommended_values)
-                blueprint.set_attribute('color', color)
-            if blueprint.has_attribute('driver_id'):
-                driver_id = random.choice(blueprint.get_attribute('driver_id').recommended_values)
-                blueprint.set_attribute('driver_id', driver_id)
+        transforms = self.spawn_points[:self.args.number_of_vehicles]
+        # pick every vehicle's blueprint in one call
+        bp_indices = random.randint(len(self.vehicle_blueprints), size=len(transforms))
+        # recommended color and driver values of each blueprint, looked up once per blueprint
+        bp_attributes = {}
+        SetAutopilot = carla.command.SetAutopilot
+        FutureActor = carla.command.FutureActor
+        tm_port = self.traffic_manager.get_port()
+        for bp_index, transform in zip(bp_indices, transforms):
+            blueprint = self.vehicle_blueprints[bp_index]
+            attributes = bp_attributes.get(blueprint.id)
+            if attributes is None:
+                attributes = bp_attributes[blueprint.id] = [
+                    (attr, blueprint.get_attribute(attr).recommended_values)
+                    for attr in ('color', 'driver_id') if blueprint.has_attribute(attr)
+                ]
+            for attr, values in attributes:
+                blueprint.set_attribute(attr, values[random.randint(len(values))])
             if hero:
                 blueprint.set_attribute('role_name', 'hero')
                 hero = False
@@ -149,51 +176,71 @@ class TrafficGenerator:
                 blueprint.set_attribute('role_name', 'autopilot')
 
             # spawn the cars and set their autopilot and light state all together
-            SetAutopilot = carla.command.SetAutopilot
-            FutureActor = carla.command.FutureActor
             batch.append(self.spawn_actor(blueprint, transform)
-                .then(SetAutopilot(FutureActor, True, self.traffic_manager.get_port())))
+                .then(SetAutopilot(FutureActor, True, tm_port)))
 
         for response in self.client.apply_batch_sync(batch, True):
             if response.error:
                 logging.error(response.error)
             else:
                 self.vehicles_list.append(response.actor_id)
+        self.vehicle_actors = list(self.world.get_actors(self.vehicles_list))
 
         logging.info('Spawned %d vehicles', len(self.vehicles_list))
 
-    def set_aggressive_behavior(self, vehicle_actor, en_lane_change, en_ignore_light, en_ignore_signs, en_overspeed):
+    def set_aggressive_behavior(self, vehicle_actor, en_lane_change, en_ignore_light, en_ignore_signs, en_overspeed,
+                                flags=None):
         # lead_dist = 0.5 + random.random_sample() # random value between 0.5 and 1.5
         # self.traffic_manager.distance_to_leading_vehicle(vehicle_actor, lead_dist)
         # logging.info('Vehicle "%s" distance to lead vehicle set to %.2f m',
         #              self.get_vehicle_desc(vehicle_actor), lead_dist)
-        lane_change, ignore_light, ignore_signs, overspeed = [self.coin_toss() for _ in range(4)]
-        if en_lane_change and lane_change:
+        if flags is None:
+            flags = [self.coin_toss() for _ in range(4)]
+        lane_change = en_lane_change and flags[0]
+        ignore_light = en_ignore_light and flags[1]
+        ignore_signs = en_ignore_signs and flags[2]
+        overspeed = en_overspeed and flags[3]
+        # per-vehicle lines are debug output, skip building their descriptions otherwise
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+        if lane_change:
             self.traffic_manager.force_lane_change(vehicle_actor, self.coin_toss())
-            logging.info('Vehicle "%s" has force lane change behavior', self.get_vehicle_desc(vehicle_actor))
-        if en_ignore_light and ignore_light:
+            if debug:
+                logging.debug('Vehicle "%s" has force lane change behavior', self.get_vehicle_desc(vehicle_actor))
+        if ignore_light:
             self.traffic_manager.ignore_lights_percentage(vehicle_actor, TrafficGenerator.IGNORE_LIGHTS_PERCENT)
-            logging.info('Vehicle "%s" has a %.1f percent chance of ignoring traffic lights',
-                         self.get_vehicle_desc(vehicle_actor), TrafficGenerator.IGNORE_LIGHTS_PERCENT)
-        if en_ignore_signs and ignore_signs:
+            if debug:
+                logging.debug('Vehicle "%s" has a %.1f percent chance of ignoring traffic lights',
+                              self.get_vehicle_desc(vehicle_actor), TrafficGenerator.IGNORE_LIGHTS_PERCENT)
+        if ignore_signs:
             self.traffic_manager.ignore_signs_percentage(vehicle_actor, TrafficGenerator.IGNORE_SIGNS_PERCENT)
-            logging.info('Vehicle "%s" has a %.1f percent chance of ignoring traffic signs',
-                         self.get_vehicle_desc(vehicle_actor), TrafficGenerator.IGNORE_SIGNS_PERCENT)
-        if en_overspeed and overspeed:
+            if debug:
+                logging.debug('Vehicle "%s" has a %.1f percent chance of ignoring traffic signs',
+                              self.get_vehicle_desc(vehicle_actor), TrafficGenerator.IGNORE_SIGNS_PERCENT)
+        if overspeed:
             self.traffic_manager.vehicle_percentage_speed_difference(vehicle_actor, TrafficGenerator.SPEED_DIFF_PERCENT)
-            logging.info('Vehicle "%s" will drive %.1f percent faster than the speed limit',
-                         self.get_vehicle_desc(vehicle_actor), -1*TrafficGenerator.SPEED_DIFF_PERCENT)
+            if debug:
+                logging.debug('Vehicle "%s" will drive %.1f percent faster than the speed limit',
+                              self.get_vehicle_desc(vehicle_actor), -1*TrafficGenerator.SPEED_DIFF_PERCENT)
+        return lane_change, ignore_light, ignore_signs, overspeed
 
     def set_aggressive_behavior_all(self, en_lane_change, en_ignore_light, en_ignore_signs, en_overspeed):
-        all_vehicle_actors = self.world.get_actors(self.vehicles_list)
-        for vehicle_actor in all_vehicle_actors:
-            self.set_aggressive_behavior(vehicle_actor, en_lane_change, en_ignore_light, en_ignore_signs, en_overspeed)
+        # toss all coins for the fleet at once, one row of (lane change, light, signs, overspeed) per vehicle
+        all_flags = (random.random_sample((len(self.vehicle_actors), 4)) < 0.5).tolist()
+        counts = [0, 0, 0, 0]
+        for vehicle_actor, flags in zip(self.vehicle_actors, all_flags):
+            applied = self.set_aggressive_behavior(
+                vehicle_actor, en_lane_change, en_ignore_light, en_ignore_signs, en_overspeed, flags
+            )
+            for i, flag in enumerate(applied):
+                counts[i] += flag
+        logging.info('Of %d vehicles, %d force lane changes, %d ignore traffic lights, %d ignore traffic signs '
+                     'and %d drive %.1f percent faster than the speed limit', len(self.vehicle_actors), *counts,
+                     -1*TrafficGenerator.SPEED_DIFF_PERCENT)
 
     def set_automatic_vehicle_lights(self):
         """Set automatic vehicle lights update if specified"""
         
-        all_vehicle_actors = self.world.get_actors(self.vehicles_list)
-        for actor in all_vehicle_actors:
+        for actor in self.vehicle_actors:
             self.traffic_manager.update_vehicle_lights(actor, True)
         logging.info('Car lights will be automatically managed by Traffic Manager')
 
@@ -217,14 +264,17 @@ class TrafficGenerator:
         # 2. we spawn the walker object
         batch = []
         walker_speed = []
-        for spawn_point in w_spawn_points:
-            walker_bp = random.choice(self.walker_blueprints)
+        # pick every walker's blueprint and gait in one call each
+        bp_indices = random.randint(len(self.walker_blueprints), size=len(w_spawn_points))
+        walking = random.random_sample(len(w_spawn_points)) > percentagePedestriansRunning
+        for spawn_point, bp_index, is_walking in zip(w_spawn_points, bp_indices, walking):
+            walker_bp = self.walker_blueprints[bp_index]
             # set as not invincible
             if walker_bp.has_attribute('is_invincible'):
                 walker_bp.set_attribute('is_invincible', 'false')
             # set the max speed
             if walker_bp.has_attribute('speed'):
-                if (random.random() > percentagePedestriansRunning):
+                if is_walking:
                     # walking
                     walker_speed.append(walker_bp.get_attribute('speed').recommended_values[1])
                 else:
@@ -235,31 +285,34 @@ class TrafficGenerator:
                 walker_speed.append(0.0)
             batch.append(self.spawn_actor(walker_bp, spawn_point))
         results = self.client.apply_batch_sync(batch, True)
-        walker_speed2 = []
-        for i in range(len(results)):
-            if results[i].error:
-                logging.error(results[i].error)
+        spawned_ids = []
+        spawned_speeds = []
+        for result, speed in zip(results, walker_speed):
+            if result.error:
+                logging.error(result.error)
             else:
-                self.walkers_list.append({'id': results[i].actor_id})
-                walker_speed2.append(walker_speed[i])
-        walker_speed = walker_speed2
+                spawned_ids.append(result.actor_id)
+                spawned_speeds.append(speed)
 
         # 3. we spawn the walker controller
-        batch = []
-        walker_controller_bp = self.world.get_blueprint_library().find('controller.ai.walker')
-        for i in range(len(self.walkers_list)):
-            batch.append(self.spawn_actor(walker_controller_bp, carla.Transform(), self.walkers_list[i]['id']))
+        batch = [
+            self.spawn_actor(self.walker_controller_bp, carla.Transform(), walker_id)
+            for walker_id in spawned_ids
+        ]
         results = self.client.apply_batch_sync(batch, True)
-        for i in range(len(results)):
-            if results[i].error:
-                logging.error(results[i].error)
-            else:
-                self.walkers_list[i]['con'] = results[i].actor_id
+        walker_speed = []
+        for walker_id, speed, result in zip(spawned_ids, spawned_speeds, results):
+            if result.error:
+                logging.error(result.error)
+                continue
+            self.walker_ids.append(walker_id)
+            self.controller_ids.append(result.actor_id)
+            walker_speed.append(speed)
 
         # 4. we put together the walkers and controllers id to get the objects from their id
-        for i in range(len(self.walkers_list)):
-            self.combined_walker_ids.append(self.walkers_list[i]['con'])
-            self.combined_walker_ids.append(self.walkers_list[i]['id'])
+        self.combined_walker_ids = [None] * (2 * len(self.walker_ids))
+        self.combined_walker_ids[0::2] = self.controller_ids
+        self.combined_walker_ids[1::2] = self.walker_ids
         self.combined_walker_actors = self.world.get_actors(self.combined_walker_ids)
         # wait for a tick to ensure client receives the last transform of the walkers we have just created
         self.world.tick()
@@ -273,14 +326,16 @@ class TrafficGenerator:
             # set walk to random point
             self.combined_walker_actors[i].go_to_location(self.world.get_random_location_from_navigation())
             # max speed
-            self.combined_walker_actors[i].set_max_speed(float(walker_speed[int(i/2)]))
+            self.combined_walker_actors[i].set_max_speed(float(walker_speed[i >> 1]))
 
-        logging.info('Spawned %d walkers', len(self.walkers_list))
+        logging.info('Spawned %d walkers', len(self.walker_ids))
 
-    @staticmethod
-    def get_vehicle_desc(vehicle_actor):
-        _, company, model = vehicle_actor.type_id.split('.')
-        return f'{company} {model} (id: {vehicle_actor.id})'
+    def get_vehicle_desc(self, vehicle_actor):
+        desc = self._vehicle_descs.get(vehicle_actor.id)
+        if desc is None:
+            _, company, model = vehicle_actor.type_id.split('.')
+            desc = self._vehicle_descs[vehicle_actor.id] = f'{company} {model} (id: {vehicle_actor.id})'
+        return desc
 
     @staticmethod
     def coin_toss():
@@ -25,6 +25,27 @@ except IndexError:
 import carla
 
 
+# carla.WeatherParameters fields, newer fields are skipped on CARLA versions without them
+WEATHER_ATTRS = (
+    'cloudiness', 'precipitation', 'precipitation_deposits', 'wind_intensity', 'sun_azimuth_angle',
+    'sun_altitude_angle', 'fog_density', 'fog_distance', 'wetness', 'fog_falloff', 'scattering_intensity',
+    'mie_scattering_scale', 'rayleigh_scattering_scale', 'dust_storm',
+)
+
+
+def copy_weather(weather):
+    """
+    Copies weather parameters, so the copy can be changed without affecting the original.
+    
+    Parameters:
+        weather (carla.WeatherParameters): Weather parameters to copy.
+    
+    Returns:
+        carla.WeatherParameters: A copy of the weather parameters.
+    """
+    return carla.WeatherParameters(**{attr: getattr(weather, attr) for attr in WEATHER_ATTRS if hasattr(weather, attr)})
+
+
 class TimeOfDay(Enum):
     """Enumeration for different times of the day."""
     NOON = auto()
@@ -46,6 +67,7 @@ class WeatherManager:
     Attributes:
         world (carla.World): The world instance where weather settings are applied.
         vehicles (list[carla.Vehicle]): Vehicles to manage lights for, defaults to empty list.
+        client (carla.Client): Client used to batch light updates, or None to update vehicles one by one.
         clear_weather, cloudy_weather, rainy_weather, foggy_weather (carla.WeatherParameters):
             Presets for different weather conditions.
         current_weather (carla.WeatherParameters): Currently applied weather parameters.
@@ -53,16 +75,18 @@ class WeatherManager:
         time_of_day (TimeOfDay): Current time of day in the simulation.
     """
 
-    def __init__(self, world, vehicles=None):
+    def __init__(self, world, vehicles=None, client=None):
         """
         Initializes the WeatherManager with a world instance and optional vehicle list.
         
         Parameters:
             world (carla.World): The world instance for weather management.
             vehicles (list[carla.Vehicle], optional): Vehicles to manage lights, defaults to None.
+            client (carla.Client, optional): Client to send all light updates in one batch, defaults to None.
         """
         self.world = world
         self.vehicles = vehicles or []
+        self.client = client
         self.clear_weather = carla.WeatherParameters.ClearNoon
         self.cloudy_weather = carla.WeatherParameters.CloudyNoon
         self.rainy_weather = carla.WeatherParameters.HardRainNoon
@@ -73,9 +97,36 @@ class WeatherManager:
             fog_distance=1.0,
             fog_falloff=1.0,
         )
+        self._weather_presets = {
+            WeatherType.CLEAR: self.clear_weather,
+            WeatherType.FOGGY: self.foggy_weather,
+            WeatherType.RAINY: self.rainy_weather,
+            WeatherType.CLOUDY: self.cloudy_weather,
+        }
+        # every weather type at every time of day, built once from copies so the presets are never changed
+        self._weather_table = {}
+        for weather_type, preset in self._weather_presets.items():
+            for time_of_day in TimeOfDay:
+                weather = copy_weather(preset)
+                if time_of_day == TimeOfDay.NOON:
+                    weather.sun_altitude_angle = 90.0
+                else:
+                    weather.sun_altitude_angle = -90.0
+                    # increasing density here because the fog seems less dense at night for some reason
+                    if weather_type == WeatherType.FOGGY:
+                        weather.fog_density += 20
+                self._weather_table[weather_type, time_of_day] = weather
+        # lights each weather type turns on, other weather types turn on none
+        self._weather_lights = {
+            WeatherType.FOGGY: int(carla.VehicleLightState.Fog | carla.VehicleLightState.LowBeam),
+            WeatherType.RAINY: int(carla.VehicleLightState.LowBeam),
+        }
         self.current_weather = None
         self.weather_type = None
         self.time_of_day = None
+        # what was last pushed to the simulator, to skip reapplying unchanged settings
+        self._applied_weather = None
+        self._applied_lights = None
 
     def set_car_lights(self, vehicle):
         """
@@ -87,12 +138,9 @@ class WeatherManager:
         if not self.weather_type:
             logging.error("Cannot set vehicle lights (weather not set)")
             return
-        light_mask = vehicle.get_light_state()
-        if self.weather_type == WeatherType.FOGGY:
-            light_mask |= carla.VehicleLightState.Fog | carla.VehicleLightState.LowBeam
-        elif self.weather_type == WeatherType.RAINY:
-            light_mask |= carla.VehicleLightState.LowBeam
-        vehicle.set_light_state(carla.VehicleLightState(light_mask))
+        light_state = self._light_state(vehicle)
+        if light_state is not None:
+            vehicle.set_light_state(light_state)
 
     def set_car_lights_all(self):
         """
@@ -100,15 +148,50 @@ class WeatherManager:
         """
         if not self.vehicles:
             logging.warning("Cannot set car lights (no vehicle info)")
+        if self.client is None or not self.weather_type:
+            for ve in self.vehicles:
+                self.set_car_lights(ve)
+            return
+        # one round trip for the whole fleet instead of one per vehicle, leaving out vehicles whose lights are set
+        set_light_state = carla.command.SetVehicleLightState
+        batch = []
         for ve in self.vehicles:
-            self.set_car_lights(ve)
+            light_state = self._light_state(ve)
+            if light_state is not None:
+                batch.append(set_light_state(ve.id, light_state))
+        if batch:
+            self.client.apply_batch(batch)
+
+    def _light_state(self, vehicle):
+        """
+        Computes the light state of a vehicle for the current weather conditions.
+        
+        Parameters:
+            vehicle (carla.Vehicle): Vehicle to compute the light state of.
+        
+        Returns:
+            carla.VehicleLightState: The vehicle's current lights with the weather's lights turned on, or None if
+                they are already on.
+        """
+        light_mask = int(vehicle.get_light_state())
+        new_light_mask = light_mask | self._weather_lights.get(self.weather_type, 0)
+        if new_light_mask == light_mask:
+            return None
+        return carla.VehicleLightState(new_light_mask)
 
     def apply_settings(self):
         """
         Applies current weather and time settings to the world and updates vehicle lights.
         """
-        self.set_car_lights_all()
-        self.world.set_weather(self.current_weather)
+        # lights are only ever turned on, so reapplying the same weather type would not change them
+        if self.weather_type != self._applied_lights:
+            self.set_car_lights_all()
+            self._applied_lights = self.weather_type
+        # presets are only changed by set_time_of_day, through these two fields
+        weather = (self.weather_type, self.current_weather.sun_altitude_angle, self.current_weather.fog_density)
+        if weather != self._applied_weather:
+            self.world.set_weather(self.current_weather)
+            self._applied_weather = weather
         logging.info(
             'Weather set to %s %s', self.weather_type.name.lower(), self.time_of_day.name.lower()
         )
@@ -124,16 +207,10 @@ class WeatherManager:
             ValueError: If an invalid weather type is provided.
         """
         self.weather_type = weather_type
-        if self.weather_type == WeatherType.CLEAR:
-            self.current_weather = self.clear_weather
-        elif self.weather_type == WeatherType.FOGGY:
-            self.current_weather = self.foggy_weather
-        elif self.weather_type == WeatherType.RAINY:
-            self.current_weather = self.rainy_weather
-        elif self.weather_type == WeatherType.CLOUDY:
-            self.current_weather = self.cloudy_weather
-        else:
+        weather = self._weather_presets.get(self.weather_type)
+        if weather is None:
             raise ValueError(f'Invalid weather type "{str(weather_type)}"')
+        self.current_weather = weather
 
     def set_time_of_day(self, time_of_day):
         """
@@ -149,15 +226,10 @@ class WeatherManager:
             logging.error('Set weather before setting time of day')
             return
         self.time_of_day = time_of_day
-        if self.time_of_day == TimeOfDay.NOON:
-            self.current_weather.sun_altitude_angle = 90.0
-        elif self.time_of_day == TimeOfDay.NIGHT:
-            self.current_weather.sun_altitude_angle = -90.0
-            # increasing density here because the fog seems less dense at night for some reason
-            if self.weather_type == WeatherType.FOGGY:
-                self.current_weather.fog_density += 20
-        else:
+        weather = self._weather_table.get((self.weather_type, self.time_of_day))
+        if weather is None:
             raise ValueError(f'Invalid time of day "{str(time_of_day)}"')
+        self.current_weather = weather
 
 
 WEATHER_PRESETS = [